@@ -2,10 +2,11 @@ from fastapi import FastAPI, HTTPException, Query, File, UploadFile, Form, Depen
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
 from boto3.dynamodb.conditions import Attr
-import boto3
 import uuid
-import json
+import asyncio
+import orjson
 import os
+import logging
 import traceback
 from dotenv import load_dotenv
 import decimal
@@ -14,11 +15,14 @@ from services.audio_processing_service import audio_processing_service
 from services.semantic_matching_service import semantic_matching_service
 from typing import List
 from utils.age_utils import AgeUtils
-from endpoints.ask_landmark import ask_landmark_question
+from utils.aws_clients import dynamodb, s3_client, S3_BUCKET
+from utils.http_client import http_session
+from endpoints.ask_landmark import ask_landmark_question, ask_landmark_question_stream
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import jwt
 from jwt import PyJWTError
@@ -27,25 +31,13 @@ from geolib import geohash
 # === Load environment variables ===
 load_dotenv()
 
+# === Logging: LOGLEVEL=DEBUG turns on per-request matching detail ===
+logging.basicConfig(level=os.getenv("LOGLEVEL", "INFO").upper(), format="%(message)s")
+
 # === Setup DynamoDB ===
-dynamodb = boto3.resource(
-    'dynamodb',
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name="us-east-2"
-)
 landmarks_table = dynamodb.Table("Landmarks")
 users_table = dynamodb.Table("Users")
 
-# === Setup S3 ===
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("AWS_REGION", "us-east-2")
-)
-S3_BUCKET = os.getenv("S3_BUCKET_NAME")
-
 # === Setup Rate Limiting ===
 limiter = Limiter(key_func=get_remote_address)
 app = FastAPI()
@@ -82,6 +74,31 @@ class UserRegistration(BaseModel):
         }
 
 # === Utility Functions ===
+# Age -> age group lookup for /get-properties (index 149 covers all older ages)
+AGE_GROUP_TABLE = tuple(["young"] * 30 + ["middleage"] * 31 + ["old"] * 89)
+
+# Parallel scan: each segment covers 1/SCAN_SEGMENTS of the table and paginates independently
+SCAN_SEGMENTS = 4
+scan_pool = ThreadPoolExecutor(max_workers=SCAN_SEGMENTS)
+
+def scan_segment(table, segment, total_segments, scan_kwargs):
+    items = []
+    kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+    while True:
+        page = table.scan(**kwargs)
+        items.extend(page.get("Items", []))
+        if "LastEvaluatedKey" not in page:
+            return items
+        kwargs["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
+async def parallel_scan(table, **scan_kwargs):
+    """Scan every page of a table, with segments read concurrently off the event loop"""
+    segments = await asyncio.gather(*[
+        asyncio.wrap_future(scan_pool.submit(scan_segment, table, segment, SCAN_SEGMENTS, scan_kwargs))
+        for segment in range(SCAN_SEGMENTS)
+    ])
+    return [item for items in segments for item in items]
+
 def convert_dynamodb_types(obj):
     if isinstance(obj, list):
         return [convert_dynamodb_types(i) for i in obj]
@@ -95,8 +112,7 @@ def get_options_from_s3(file_key: str) -> dict:
     """Fetch options (countries, languages, interests) from S3"""
     try:
         response = s3_client.get_object(Bucket=S3_BUCKET, Key=file_key)
-        content = response['Body'].read().decode('utf-8')
-        return json.loads(content)
+        return orjson.loads(response['Body'].read())
     except Exception as e:
         print(f"❌ Error fetching {file_key} from S3: {e}")
         # Return default options if S3 fetch fails
@@ -319,15 +335,15 @@ async def get_properties(
         geohash_code = "9z7dw9"
         print("Query geohash:", geohash_code)
 
-        scan_results = landmarks_table.scan(
+        scan_items = await parallel_scan(
+            landmarks_table,
             FilterExpression=Attr("geohash").eq(geohash_code)
         )
 
-        classify_age = lambda age: "young" if age < 30 else "middleage" if age <= 60 else "old"
-        age_group = classify_age(int(userAge))
+        age_group = AGE_GROUP_TABLE[max(0, min(int(userAge), len(AGE_GROUP_TABLE) - 1))]
 
         properties = []
-        for item in scan_results.get("Items", []):
+        for item in scan_items:
             landmark_name = item["landmark_id"]
 
             keys_to_extract = [
@@ -405,7 +421,7 @@ async def get_landmark_response(
 
         # Fetch the consolidated JSON from S3
         try:
-            json_response = requests.get(item["json_url"], timeout=10)
+            json_response = http_session.get(item["json_url"], timeout=10)
             json_response.raise_for_status()
             json_data = json_response.json()
             
@@ -501,3 +517,21 @@ async def ask_landmark_endpoint(
         sessionId=sessionId,
         audio_file=audio_file
     )
+
+@app.post("/ask-landmark/stream")
+@limiter.limit("5/minute")
+async def ask_landmark_stream_endpoint(
+    request: Request,
+    landmark: str = Form(...),
+    question: str = Form(...),
+    user=Depends(get_current_user),
+    userCountry: str = Form("United States"),
+    interestOne: str = Form("Nature")
+):
+    """Answer as plain text; the LLM fallback streams so clients can start reading/speaking at the first token"""
+    return await ask_landmark_question_stream(
+        landmark=landmark,
+        question=question,
+        userCountry=userCountry,
+        interestOne=interestOne
+    )
@@ -1,40 +1,70 @@
 # audio_api.py
 
-from fastapi import FastAPI, Query
+from fastapi import BackgroundTasks, FastAPI, Query
 from google.cloud import texttospeech
-from fastapi.responses import FileResponse
-import uuid
+from fastapi.responses import FileResponse, Response
+import asyncio
+import hashlib
 import os
+import re
+import tempfile
 
 app = FastAPI()
-tts_client = texttospeech.TextToSpeechClient()
+# Created on first use so the gRPC channel binds to the server's running event loop
+tts_client = None
 
 AUDIO_DIR = "audio"
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
-@app.get("/generate-audio/")
-async def generate_audio(text: str = Query(...)):
-    filename = f"{uuid.uuid4()}.mp3"
-    output_path = os.path.join(AUDIO_DIR, filename)
-
-    synthesis_input = texttospeech.SynthesisInput(text=text)
-    voice = texttospeech.VoiceSelectionParams(
+VOICE = texttospeech.VoiceSelectionParams(
     language_code="en-US",
     name="en-US-Wavenet-D",  # Exact male voice name
     ssml_gender=texttospeech.SsmlVoiceGender.MALE  # ← REQUIRED to force male
-)   
+)
+AUDIO_CONFIG = texttospeech.AudioConfig(
+    audio_encoding=texttospeech.AudioEncoding.MP3
+)
+
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+# Cap on concurrent synthesize_speech calls across all requests
+TTS_CONCURRENCY = 8
+tts_semaphore = asyncio.Semaphore(TTS_CONCURRENCY)
 
-    audio_config = texttospeech.AudioConfig(
-        audio_encoding=texttospeech.AudioEncoding.MP3
-    )
+def get_tts_client() -> texttospeech.TextToSpeechAsyncClient:
+    global tts_client
+    if tts_client is None:
+        tts_client = texttospeech.TextToSpeechAsyncClient()
+    return tts_client
 
-    response = tts_client.synthesize_speech(
-        input=synthesis_input,
-        voice=voice,
-        audio_config=audio_config
-    )
+async def synthesize_sentence(sentence: str) -> bytes:
+    async with tts_semaphore:
+        response = await get_tts_client().synthesize_speech(
+            input=texttospeech.SynthesisInput(text=sentence),
+            voice=VOICE,
+            audio_config=AUDIO_CONFIG
+        )
+    return response.audio_content
+
+def write_audio_file(path: str, audio: bytes):
+    # Write then rename, so a concurrent request never serves a partial file
+    # A unique temp file per call: concurrent writers of the same path never share one
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".", suffix=".tmp", delete=False) as out:
+        out.write(audio)
+    os.replace(out.name, path)
+
+@app.get("/generate-audio/")
+async def generate_audio(background_tasks: BackgroundTasks, text: str = Query(...)):
+    # Name the file by a hash of the text so repeated requests reuse the same synthesis
+    filename = f"{hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()}.mp3"
+    output_path = os.path.join(AUDIO_DIR, filename)
+    if os.path.exists(output_path):
+        return FileResponse(output_path, media_type="audio/mpeg")
 
-    with open(output_path, "wb") as out:
-        out.write(response.audio_content)
+    # Synthesize sentences in parallel; MP3 frames concatenate into one playable stream
+    sentences = [sentence for sentence in SENTENCE_SPLIT_RE.split(text.strip()) if sentence] or [text]
+    chunks = await asyncio.gather(*[synthesize_sentence(sentence) for sentence in sentences])
 
-    return FileResponse(output_path, media_type="audio/mpeg")
+    # Serve the bytes from memory; the disk cache is written after the response is sent
+    audio = b"".join(chunks)
+    background_tasks.add_task(write_audio_file, output_path, audio)
+    return Response(content=audio, media_type="audio/mpeg")
@@ -1,67 +1,114 @@
 from fastapi import HTTPException, Form, File, UploadFile
+from fastapi.responses import StreamingResponse
 import uuid
-import json
+import gzip
+import copy
+import asyncio
+import orjson
+import re
 import time
-import requests
-import boto3
 import os
 from datetime import datetime
+from typing import NamedTuple
 from dotenv import load_dotenv
+from cachetools import LRUCache, TTLCache
+from botocore.exceptions import ClientError
 from services.audio_processing_service import audio_processing_service
-from services.semantic_matching_service import semantic_matching_service
+from services.semantic_matching_service import semantic_matching_service, SEMANTIC_KEY_THRESHOLD
 from services.llm_service import llm_service
+from utils.aws_clients import dynamodb, s3_client, S3_BUCKET
+from utils.http_client import http_session
+from utils.local_config import LANDMARKS
 # Remove this line: from services.dynamic_semantic_service import dynamic_semantic_service
 
 # === Load environment variables ===
 load_dotenv()
 
 # === Setup DynamoDB ===
-dynamodb = boto3.resource(
-    'dynamodb',
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name="us-east-2"
-)
 semantic_table = dynamodb.Table("semantic_responses")
 
 # === Setup S3 ===
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("AWS_REGION", "us-east-2")
-)
-S3_BUCKET = os.getenv("S3_BUCKET_NAME")
 S3_URL_BASE = os.getenv("S3_URL_BASE")
 
+# === In-process cache of semantic response JSON, keyed by S3 key ===
+# Hot landmarks are served from memory; the TTL bounds staleness across workers
+semantic_json_cache = TTLCache(maxsize=512, ttl=300)
+# ETag and raw JSON bytes outlive the TTL, so an expired entry is revalidated with a conditional GET.
+# Bytes are an immutable snapshot of what S3 holds: a 304 re-parses them, never a live dict.
+semantic_json_etags = LRUCache(maxsize=2048)
+
+def read_semantic_json(s3_key: str, cached: tuple = None) -> tuple:
+    """
+    Download and decode a semantic response JSON from S3 (blocking; run in a thread).
+    cached is a previous (etag, body); if the object is unchanged S3 answers 304 and the body is reused.
+    Returns (etag, body, json_data), where body is the decompressed JSON bytes.
+    """
+    conditional = {"IfNoneMatch": cached[0]} if cached else {}
+    try:
+        s3_response = s3_client.get_object(Bucket=S3_BUCKET, Key=s3_key, **conditional)
+    except ClientError as e:
+        if cached and e.response.get("Error", {}).get("Code") in ("304", "NotModified"):
+            return cached[0], cached[1], orjson.loads(cached[1])
+        raise
+    body = s3_response['Body'].read()
+    # Batch-generated responses are stored gzip-compressed
+    if s3_response.get('ContentEncoding') == 'gzip':
+        body = gzip.decompress(body)
+    return s3_response['ETag'], body, orjson.loads(body)
+
+# === Response builder shared by every retrieval path ===
+def _build_response(message: str, answer: str, source: str, retrieval_path: str, semantic_key: str = None, **debug_extra) -> dict:
+    """Build the standard ask-landmark response payload"""
+    return {
+        "status": "success",
+        "message": message,
+        "data": {
+            "answer": answer,
+            "source": source
+        },
+        "debug": {
+            "semanticKeyUsed": semantic_key,
+            "retrievalPath": retrieval_path,
+            **debug_extra
+        }
+    }
+
 # === Add simple semantic key creation logic ===
+# Checked in priority order: the first category with any keyword in the question wins
+NEW_SEMANTIC_KEY_KEYWORDS = [
+    ("recreation.nearby", ["jog", "run", "exercise", "workout", "fitness"]),
+    ("dining.nearby", ["eat", "food", "restaurant", "dining", "lunch", "dinner"]),
+    ("access.parking", ["park", "parking", "car", "drive"]),
+    ("access.transport", ["bus", "transport", "transit", "subway", "train"]),
+    ("culture.photography", ["photo", "picture", "instagram", "selfie"]),
+    ("origin.general", ["history", "historical", "past", "origin"]),
+    ("origin.name", ["name", "called", "title"]),
+    ("culture.symbolism", ["symbol", "meaning", "significance"]),
+    ("myths.legends", ["story", "legend", "myth", "tale"]),
+]
+_KEYWORD_PRIORITY = {}
+for _priority, (_key, _words) in enumerate(NEW_SEMANTIC_KEY_KEYWORDS):
+    for _word in _words:
+        _KEYWORD_PRIORITY.setdefault(_word, _priority)
+# Zero-width lookahead finds a keyword at every offset (substring semantics, overlaps included)
+# in one scan. Longest-first, so at a shared offset the longer keyword wins; no keyword is
+# a prefix of another category's, so that never changes which category is picked
+NEW_SEMANTIC_KEY_RE = re.compile(
+    "(?=(" + "|".join(re.escape(w) for w in sorted(_KEYWORD_PRIORITY, key=len, reverse=True)) + "))"
+)
+
 def create_semantic_key_from_question(question_text: str, landmark_id: str) -> str:
     """Create a semantic key based on the question content"""
     question_lower = question_text.lower()
     
-    # Simple keyword-based mapping
-    if any(word in question_lower for word in ["jog", "run", "exercise", "workout", "fitness"]):
-        return "recreation.nearby"
-    elif any(word in question_lower for word in ["eat", "food", "restaurant", "dining", "lunch", "dinner"]):
-        return "dining.nearby"
-    elif any(word in question_lower for word in ["park", "parking", "car", "drive"]):
-        return "access.parking"
-    elif any(word in question_lower for word in ["bus", "transport", "transit", "subway", "train"]):
-        return "access.transport"
-    elif any(word in question_lower for word in ["photo", "picture", "instagram", "selfie"]):
-        return "culture.photography"
-    elif any(word in question_lower for word in ["history", "historical", "past", "origin"]):
-        return "origin.general"
-    elif any(word in question_lower for word in ["name", "called", "title"]):
-        return "origin.name"
-    elif any(word in question_lower for word in ["symbol", "meaning", "significance"]):
-        return "culture.symbolism"
-    elif any(word in question_lower for word in ["story", "legend", "myth", "tale"]):
-        return "myths.legends"
-    else:
-        # Default to a general category based on landmark type
-        landmark_type = get_landmark_type(landmark_id)
-        return f"{landmark_type}.general"
+    # Simple keyword-based mapping, one pass over the question
+    priorities = [_KEYWORD_PRIORITY[m.group(1)] for m in NEW_SEMANTIC_KEY_RE.finditer(question_lower)]
+    if priorities:
+        return NEW_SEMANTIC_KEY_KEYWORDS[min(priorities)][0]
+    
+    # Default to a general category based on landmark type
+    landmark_type = get_landmark_type(landmark_id)
+    return f"{landmark_type}.general"
 
 async def update_semantic_config(landmark_id: str, semantic_key: str, question_text: str) -> bool:
     """Update semantic_config.json in S3 with new semantic key"""
@@ -75,14 +122,13 @@ async def update_semantic_config(landmark_id: str, semantic_key: str, question_t
         # 2. Read current semantic_config.json from S3
         s3_config_key = "config/semantic_config.json"
         try:
-            s3_response = s3_client.get_object(Bucket=S3_BUCKET, Key=s3_config_key)
-            config_data = json.loads(s3_response['Body'].read().decode('utf-8'))
+            _, _, config_data = await asyncio.to_thread(read_semantic_json, s3_config_key)
             print(f"✅ Read semantic_config.json from S3: {s3_config_key}")
         except Exception as e:
             print(f"⚠️ Failed to read from S3, trying local file: {e}")
             try:
-                with open("scripts/semantic_config.json", "r") as f:
-                    config_data = json.load(f)
+                with open("scripts/semantic_config.json", "rb") as f:
+                    config_data = orjson.loads(f.read())
                 print(f"✅ Read semantic_config.json from local file")
             except Exception as e2:
                 print(f"❌ Failed to read semantic_config.json: {e2}")
@@ -103,8 +149,9 @@ async def update_semantic_config(landmark_id: str, semantic_key: str, question_t
         print(f"✅ Added new semantic key '{semantic_key}' to '{landmark_type}' section")
         
         # 6. Upload updated config back to S3
-        config_content = json.dumps(config_data, indent=2)
-        s3_client.put_object(
+        config_content = orjson.dumps(config_data, option=orjson.OPT_INDENT_2)
+        await asyncio.to_thread(
+            s3_client.put_object,
             Bucket=S3_BUCKET,
             Key=s3_config_key,
             Body=config_content,
@@ -120,6 +167,13 @@ async def update_semantic_config(landmark_id: str, semantic_key: str, question_t
         print(f"❌ Error updating semantic config: {e}")
         return False
 
+# Client country spellings normalized to the names used in generated responses
+COUNTRY_MAP = {
+    "UnitedStatesofAmerica": "United States",
+    "USA": "United States",
+    "US": "United States"
+}
+
 async def ask_landmark_question(
     landmark: str = Form(...),
     question: str = Form(None),
@@ -146,20 +200,14 @@ async def ask_landmark_question(
         landmark_id = landmark.replace(" ", "_")
         
         # Normalize country mapping
-        country_map = {
-            "UnitedStatesofAmerica": "United States",
-            "USA": "United States",
-            "US": "United States"
-        }
-        userCountry = country_map.get(userCountry, userCountry)
+        userCountry = COUNTRY_MAP.get(userCountry, userCountry)
         
         # 2. Get question text (from text or audio)
         question_text = None
         if audio_file:
             print(f"🎤 Processing audio file: {audio_file.filename}")
-            audio_content = await audio_file.read()
             file_extension = audio_file.filename.split(".")[-1] if "." in audio_file.filename else "m4a"
-            question_text = await audio_processing_service.audio_to_text(audio_content, file_extension)
+            question_text = await audio_processing_service.audio_to_text(audio_file.file, file_extension)
             print(f" Audio converted to question: '{question_text}'")
         elif question:
             question_text = question
@@ -167,14 +215,14 @@ async def ask_landmark_question(
         else:
             raise HTTPException(status_code=400, detail="Either question or audio_file must be provided")
         
-        # 3. Semantic key mapping
-        semantic_key, confidence = semantic_matching_service.get_landmark_specific_semantic_key(
-            question_text, landmark_id
+        # 3. Semantic key mapping (encode + FAISS search release the GIL, so run off the event loop)
+        semantic_key, confidence = await asyncio.to_thread(
+            semantic_matching_service.get_landmark_specific_semantic_key, question_text, landmark_id
         )
         
         print(f"🔍 Semantic mapping result: {semantic_key} (confidence: {confidence})")
         
-        if semantic_key and confidence > 0.4:  # High confidence threshold
+        if semantic_key and confidence > SEMANTIC_KEY_THRESHOLD:  # High confidence threshold
             # 4. Handle successful semantic key mapping
             return await handle_semantic_mapping(
                 landmark_id, semantic_key, question_text, userCountry, interestOne
@@ -190,6 +238,45 @@ async def ask_landmark_question(
         print(" ERROR in /ask-landmark:", e)
         raise HTTPException(status_code=500, detail=f"Failed to process question: {str(e)}")
 
+# Appended when a stream fails after the 200 has been sent, so clients can tell it was cut short
+STREAM_ERROR_CHUNK = "\n\n[ERROR] The answer could not be completed."
+
+async def _stream_with_error_chunk(pieces):
+    """Relay a text stream, ending it with STREAM_ERROR_CHUNK instead of silently truncating on failure"""
+    try:
+        async for piece in pieces:
+            yield piece
+    except Exception as e:
+        print(f"❌ ERROR in /ask-landmark/stream: {e}")
+        yield STREAM_ERROR_CHUNK
+
+async def ask_landmark_question_stream(landmark: str, question: str, userCountry: str, interestOne: str) -> StreamingResponse:
+    """
+    Streaming variant of ask_landmark_question. Semantic-key and stored Q&A answers are
+    looked up first and sent whole; only the general LLM fallback is streamed token by token.
+    """
+    landmark_id = landmark.replace(" ", "_")
+    userCountry = COUNTRY_MAP.get(userCountry, userCountry)
+    
+    semantic_key, confidence = await asyncio.to_thread(
+        semantic_matching_service.get_landmark_specific_semantic_key, question, landmark_id
+    )
+    if semantic_key and confidence > SEMANTIC_KEY_THRESHOLD:
+        response = await handle_semantic_mapping(
+            landmark_id, semantic_key, question, userCountry, interestOne
+        )
+        return StreamingResponse(
+            iter([response["data"]["answer"]]),
+            media_type="text/plain; charset=utf-8",
+            headers={"X-Answer-Source": response["data"]["source"]}
+        )
+    
+    return StreamingResponse(
+        _stream_with_error_chunk(llm_service.generate_response_stream(question, landmark_id, userCountry, interestOne)),
+        media_type="text/plain; charset=utf-8",
+        headers={"X-Answer-Source": "llm_stream"}
+    )
+
 async def handle_semantic_mapping(
     landmark_id: str, semantic_key: str, question_text: str, 
     userCountry: str, interestOne: str
@@ -198,8 +285,9 @@ async def handle_semantic_mapping(
     try:
         print(f"✅ Found semantic key: {semantic_key}")
         
-        # Query the semantic_responses table
-        response = semantic_table.get_item(
+        # Query the semantic_responses table (off the event loop; boto3 blocks)
+        response = await asyncio.to_thread(
+            semantic_table.get_item,
             Key={
                 "landmark_id": landmark_id,
                 "semantic_key": semantic_key
@@ -221,21 +309,26 @@ async def handle_semantic_mapping(
         url_path = original_json_url.split('.net/')[-1]
         s3_key = url_path
         
-        # Read directly from S3
+        # Read from the local cache, then directly from S3
         try:
-            s3_response = s3_client.get_object(Bucket=S3_BUCKET, Key=s3_key)
-            json_data = json.loads(s3_response['Body'].read().decode('utf-8'))
-            print(f"✅ Read directly from S3: {s3_key}")
+            json_data = semantic_json_cache.get(s3_key)
+            if json_data is not None:
+                print(f"✅ Read from local cache: {s3_key}")
+            else:
+                etag, body, json_data = await asyncio.to_thread(
+                    read_semantic_json, s3_key, semantic_json_etags.get(s3_key)
+                )
+                semantic_json_cache[s3_key] = json_data
+                semantic_json_etags[s3_key] = (etag, body)
+                print(f"✅ Read directly from S3: {s3_key}")
         except Exception as e:
             print(f"⚠️ Failed to read from S3, falling back to CloudFront: {e}")
             # Fallback to CloudFront
-            json_response = requests.get(original_json_url, timeout=10)
+            json_response = http_session.get(original_json_url, timeout=10)
             json_response.raise_for_status()
             json_data = json_response.json()
         
-        # Debug: Print the actual JSON content being read
         print(f"🔍 JSON data keys: {list(json_data.keys())}")
-        print(f" JSON data content: {json.dumps(json_data, indent=2)[:500]}...")
         
         # ALWAYS try specific answers first
         print("🔍 Always trying specific answers first")
@@ -272,18 +365,13 @@ async def try_specific_answers(
             if normalized_question == key.lower():
                 # Exact match only - remove the problematic contains logic
                 print(f"✅ Found exact keyword match: {key}")
-                return {
-                    "status": "success",
-                    "message": "Retrieved specific answer from database",
-                    "data": {
-                        "answer": value,
-                        "source": "database_qa"
-                    },
-                    "debug": {
-                        "semanticKeyUsed": semantic_key,
-                        "retrievalPath": "exact_qa_match"
-                    }
-                }
+                return _build_response(
+                    message="Retrieved specific answer from database",
+                    answer=value,
+                    source="database_qa",
+                    retrieval_path="exact_qa_match",
+                    semantic_key=semantic_key
+                )
         
         # 2. Try semantic similarity matching for Q&A pairs
         similar_qa, similarity = await find_similar_qa_pair(question_text, specific_youtubes)
@@ -291,37 +379,27 @@ async def try_specific_answers(
             qa_question, qa_answer = similar_qa
             print(f"✅ Found semantically similar Q&A: {qa_question} (similarity: {similarity})")
             
-            return {
-                "status": "success",
-                "message": "Retrieved similar answer from database",
-                "data": {
-                    "answer": qa_answer,
-                    "source": "database_qa_semantic_match"
-                },
-                "debug": {
-                    "semanticKeyUsed": semantic_key,
-                    "similarQuestion": qa_question,
-                    "similarity": similarity,
-                    "retrievalPath": "semantic_qa_match"
-                }
-            }
+            return _build_response(
+                message="Retrieved similar answer from database",
+                answer=qa_answer,
+                source="database_qa_semantic_match",
+                retrieval_path="semantic_qa_match",
+                semantic_key=semantic_key,
+                similarQuestion=qa_question,
+                similarity=similarity
+            )
         
         # 3. Try extracted_details lookup
         for key, value in extracted_details.items():
             if any(word in normalized_question for word in key.lower().split()):
                 print(f"✅ Found extracted detail: {key}")
-                return {
-                    "status": "success",
-                    "message": "Retrieved extracted detail from database",
-                    "data": {
-                        "answer": value,
-                        "source": "database_extracted"
-                    },
-                    "debug": {
-                        "semanticKeyUsed": semantic_key,
-                        "retrievalPath": "extracted_details_lookup"
-                    }
-                }
+                return _build_response(
+                    message="Retrieved extracted detail from database",
+                    answer=value,
+                    source="database_extracted",
+                    retrieval_path="extracted_details_lookup",
+                    semantic_key=semantic_key
+                )
         
         # 4. If no specific answer found, use LLM with fact extraction
         print(" No specific answer found, using LLM fallback with fact extraction")
@@ -338,20 +416,22 @@ async def try_specific_answers(
 async def find_similar_qa_pair(question_text: str, specific_youtubes: dict) -> tuple:
     """Find similar Q&A pair using semantic matching"""
     try:
-        best_match = None
-        best_similarity = 0
+        if not specific_youtubes:
+            return None, 0
         
-        for qa_question, qa_answer in specific_youtubes.items():
-            # Use semantic matching to compare questions
-            similarity = semantic_matching_service.calculate_similarity(
-                question_text, qa_question
-            )
-            
-            if similarity > best_similarity and similarity > 0.6:  # Threshold
-                best_similarity = similarity
-                best_match = (qa_question, qa_answer)
+        # Score every stored question against the user's question in one batch
+        qa_questions = list(specific_youtubes.keys())
+        similarities = await asyncio.to_thread(
+            semantic_matching_service.calculate_similarities, question_text, qa_questions
+        )
+        best_idx = int(similarities.argmax())
+        best_similarity = float(similarities[best_idx])
         
-        return best_match, best_similarity
+        if best_similarity > 0.6:  # Threshold
+            qa_question = qa_questions[best_idx]
+            return (qa_question, specific_youtubes[qa_question]), best_similarity
+        
+        return None, 0
         
     except Exception as e:
         print(f"Error finding similar Q&A pair: {e}")
@@ -365,12 +445,10 @@ async def handle_llm_with_facts(
     try:
         print("🤖 Using LLM for specific detail generation with fact extraction")
         
-        # ✅ NEW: Get landmark info (city/country) from landmarks.json
-        city, country = get_landmark_info(landmark_id)  # Remove async since it's now synchronous
+        # ✅ NEW: Get landmark info (city/country/type) from landmarks.json in one lookup
+        landmark = get_landmark(landmark_id)
+        city, country, landmark_type = landmark.city, landmark.country, landmark.type
         print(f" Landmark location: {city}, {country}")
-        
-        # Get landmark type for context
-        landmark_type = get_landmark_type(landmark_id)
         print(f"🏛️ Landmark type: {landmark_type}")
         
         # ✅ NEW: Use semantic config prompt with city/country instead of generic LLM
@@ -421,19 +499,14 @@ async def handle_llm_with_facts(
             semantic_key, landmark_id, original_json_url
         )
         
-        return {
-            "status": "success",
-            "message": "Generated new answer using LLM",
-            "data": {
-                "answer": answer,
-                "source": source
-            },
-            "debug": {
-                "semanticKeyUsed": semantic_key,
-                "retrievalPath": "llm_generated",
-                "factsExtracted": len(extracted_facts)
-            }
-        }
+        return _build_response(
+            message="Generated new answer using LLM",
+            answer=answer,
+            source=source,
+            retrieval_path="llm_generated",
+            semantic_key=semantic_key,
+            factsExtracted=len(extracted_facts)
+        )
         
     except Exception as e:
         print(f"Error in handle_llm_with_facts: {e}")
@@ -460,64 +533,64 @@ async def handle_llm_fallback(
             interest=interestOne
         )
         
-        return {
-            "status": "success",
-            "message": "Generated answer using LLM fallback",
-            "data": {
-                "answer": answer,
-                "source": "llm_fallback"
-            },
-            "debug": {
-                "semanticKeyUsed": None,
-                "retrievalPath": "llm_fallback"
-            }
-        }
+        return _build_response(
+            message="Generated answer using LLM fallback",
+            answer=answer,
+            source="llm_fallback",
+            retrieval_path="llm_fallback",
+            semantic_key=None
+        )
         
     except Exception as e:
         print(f"Error in handle_llm_fallback: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate response: {str(e)}")
 
+# Flat JSON objects, allowing braces and escaped quotes inside string values
+JSON_OBJECT_RE = re.compile(r'\{(?:[^{}"]|"(?:[^"\\]|\\.)*")*\}', re.DOTALL)
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+def _cheap_facts(answer: str) -> dict:
+    """Return facts from a JSON object embedded in the answer, or {} when there is none"""
+    for json_block in JSON_OBJECT_RE.findall(answer):
+        try:
+            facts = orjson.loads(json_block)
+            if isinstance(facts, dict) and len(facts) >= 2:
+                return facts
+        except orjson.JSONDecodeError:
+            continue
+    return {}
+
+def _sentence_facts(answer: str, max_facts: int = 5) -> dict:
+    """Last-resort facts: the answer's first few sentences"""
+    sentences = [s.strip() for s in SENTENCE_SPLIT_RE.split(answer) if s.strip()]
+    return {f"fact_{i}": sentence for i, sentence in enumerate(sentences[:max_facts])}
+
 async def extract_facts_from_response(question: str, answer: str) -> dict:
     """Extract facts from LLM response"""
     try:
-        # Use LLM to extract facts from the answer
-        fact_extraction_prompt = f"""
-        Extract key facts from this answer about the landmark. Return only the facts as a JSON object with descriptive keys.
-        
-        Question: {question}
-        Answer: {answer}
-        
-        Return format: {{"fact1": "description", "fact2": "description"}}
-        """
-        
-        facts_response = await llm_service.generate_response(
-            question=fact_extraction_prompt,
-            landmark_id="fact_extraction",
-            landmark_type="general",
-            user_country="United States",
-            interest="general"
+        # Skip the LLM round-trip only when the answer already embeds a JSON object of facts
+        extracted_facts = _cheap_facts(answer)
+        if extracted_facts:
+            return extracted_facts
+        
+        # Use LLM to extract facts from the answer; JSON mode guarantees a parseable object
+        fact_extraction_prompt = (
+            "Extract key facts from this answer about the landmark. "
+            "Return only the facts as a JSON object with descriptive keys.\n\n"
+            f"Question: {question}\n"
+            f"Answer: {answer}\n\n"
+            'Return format: {"fact1": "description", "fact2": "description"}'
         )
-        
-        # Try to parse JSON from response
-        try:
-            # Extract JSON from the response
-            start_idx = facts_response.find('{')
-            end_idx = facts_response.rfind('}') + 1
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = facts_response[start_idx:end_idx]
-                extracted_facts = json.loads(json_str)
-            else:
-                # Fallback: create simple fact
-                extracted_facts = {"general_info": answer[:100] + "..."}
-        except json.JSONDecodeError:
-            # Fallback: create simple fact
-            extracted_facts = {"general_info": answer[:100] + "..."}
+        extracted_facts = await llm_service.generate_json(fact_extraction_prompt)
+        if not extracted_facts:
+            # Fallback: split the answer into sentences
+            extracted_facts = _sentence_facts(answer) or {"general_info": answer[:100] + "..."}
         
         return extracted_facts
         
     except Exception as e:
         print(f"Error extracting facts: {e}")
-        return {"general_info": answer[:100] + "..."}
+        return _sentence_facts(answer) or {"general_info": answer[:100] + "..."}
 
 async def update_json_with_qa_and_facts(
     json_data: dict, question_text: str, answer: str, extracted_facts: dict, 
@@ -525,6 +598,10 @@ async def update_json_with_qa_and_facts(
 ):
     """Update JSON file with new Q&A pair and extracted facts"""
     try:
+        # json_data may be the cached object other requests are reading; change a copy and
+        # only publish it to the cache once S3 has accepted it
+        json_data = copy.deepcopy(json_data)
+        
         # Add new Q&A pair to specific_Youtubes
         if "specific_Youtubes" not in json_data:
             json_data["specific_Youtubes"] = {}
@@ -550,15 +627,18 @@ async def update_json_with_qa_and_facts(
         s3_key = url_path
         
         # Convert to JSON string
-        json_content = json.dumps(json_data, indent=2)
+        json_content = orjson.dumps(json_data)
         
         # Upload to S3 using the same key as the original URL
-        s3_client.put_object(
+        put_response = await asyncio.to_thread(
+            s3_client.put_object,
             Bucket=S3_BUCKET,
             Key=s3_key,
             Body=json_content,
             ContentType="application/json"
         )
+        semantic_json_cache[s3_key] = json_data
+        semantic_json_etags[s3_key] = (put_response['ETag'], json_content)
         
         print(f"✅ Updated JSON file: {s3_key}")
         print(f"✅ Writing to same location as original URL: {original_json_url}")
@@ -679,18 +759,21 @@ async def handle_new_semantic_key(
         # 6. Upload to S3
         s3_key = f"semantic_responses/{landmark_id.lower()}_{semantic_key}.json"
         
-        json_content = json.dumps(json_data, indent=2)
-        s3_client.put_object(
+        json_content = orjson.dumps(json_data)
+        put_response = await asyncio.to_thread(
+            s3_client.put_object,
             Bucket=S3_BUCKET,
             Key=s3_key,
             Body=json_content,
             ContentType="application/json"
         )
+        semantic_json_cache[s3_key] = json_data
+        semantic_json_etags[s3_key] = (put_response['ETag'], json_content)
         
         # 7. Update DynamoDB to point to the new JSON file
         json_url = f"{S3_URL_BASE}/{s3_key}"
         
-        semantic_table.put_item(Item={
+        await asyncio.to_thread(semantic_table.put_item, Item={
             "landmark_id": landmark_id,
             "semantic_key": semantic_key,
             "json_url": json_url,
@@ -705,22 +788,17 @@ async def handle_new_semantic_key(
         print(f"⚠️ NOTE: Run batch script later to populate all age groups and countries for this semantic key")
         
         # 8. Return the response
-        return {
-            "status": "success",
-            "message": "Generated response using new semantic key",
-            "data": {
-                "answer": answer,
-                "source": "dynamic_semantic_generated"
-            },
-            "debug": {
-                "semanticKeyUsed": semantic_key,
-                "retrievalPath": "dynamic_semantic_creation",
-                "factsExtracted": len(extracted_facts),
-                "newJsonFile": s3_key,
-                "ageGroup": age_group,
-                "needsBatchUpdate": True  # Flag to run batch script later
-            }
-        }
+        return _build_response(
+            message="Generated response using new semantic key",
+            answer=answer,
+            source="dynamic_semantic_generated",
+            retrieval_path="dynamic_semantic_creation",
+            semantic_key=semantic_key,
+            factsExtracted=len(extracted_facts),
+            newJsonFile=s3_key,
+            ageGroup=age_group,
+            needsBatchUpdate=True
+        )
         
     except Exception as e:
         print(f"Error in handle_new_semantic_key: {e}")
@@ -728,47 +806,49 @@ async def handle_new_semantic_key(
             landmark_id, question_text, userCountry, interestOne
         )
 
-def get_landmark_type(landmark_id: str) -> str:
-    """Get landmark type from landmarks.json"""
+def _normalize_landmark_id(name: str) -> str:
+    """Normalize a landmark name or id to the lookup key used by the landmark index"""
+    return name.lower().replace(" ", "_")
+
+def _load_landmark_index() -> dict:
+    """Build the normalized landmark id -> landmark record index from landmarks.json"""
     try:
-        # Read from landmarks.json to get the actual type
-        with open("scripts/landmarks.json", "r") as f:
-            landmarks = json.load(f)
-        
-        # Find the landmark by name
-        landmark_name = landmark_id.replace("_", " ")
-        for landmark in landmarks:
-            if landmark["name"] == landmark_name:
-                print(f"✅ Found landmark type: {landmark['type']} for {landmark_name}")
-                return landmark["type"]  # This will return "religious" for Saint Anne
-        
-        print(f"⚠️ Landmark '{landmark_name}' not found in landmarks.json")
-        return "general"
+        return {_normalize_landmark_id(landmark["name"]): landmark for landmark in LANDMARKS}
     except Exception as e:
         print(f"⚠️ Error reading landmarks.json: {e}")
-        return "general"
+        return {}
+
+# Built once at import so request-path lookups are a single dict probe
+LANDMARK_INDEX = _load_landmark_index()
+
+class LandmarkRecord(NamedTuple):
+    city: str
+    country: str
+    type: str
+
+def get_landmark(landmark_id: str) -> LandmarkRecord:
+    """Get landmark city, country and type from landmarks.json in a single lookup"""
+    landmark = LANDMARK_INDEX.get(_normalize_landmark_id(landmark_id))
+    if landmark:
+        record = LandmarkRecord(
+            city=landmark.get("city", "San Luis Obispo"),
+            country=landmark.get("country", "United States"),
+            type=landmark.get("type", "general")
+        )
+        print(f"✅ Found landmark: {record.type} in {record.city}, {record.country} for {landmark['name']}")
+        return record
+    
+    print(f"⚠️ Landmark '{landmark_id.replace('_', ' ')}' not found in landmarks.json")
+    return LandmarkRecord(city="San Luis Obispo", country="United States", type="general")
+
+def get_landmark_type(landmark_id: str) -> str:
+    """Get landmark type from landmarks.json"""
+    return get_landmark(landmark_id).type
 
 def get_landmark_info(landmark_id: str) -> tuple:
     """Get landmark city and country from landmarks.json"""
-    try:
-        # Read from landmarks.json to get city/country
-        with open("scripts/landmarks.json", "r") as f:
-            landmarks = json.load(f)
-        
-        # Find the landmark by name
-        landmark_name = landmark_id.replace("_", " ")
-        for landmark in landmarks:
-            if landmark["name"] == landmark_name:
-                city = landmark.get("city", "San Luis Obispo")
-                country = landmark.get("country", "United States")
-                print(f"✅ Found landmark location: {city}, {country} for {landmark_name}")
-                return city, country
-        
-        print(f"⚠️ Landmark '{landmark_name}' not found in landmarks.json")
-        return "San Luis Obispo", "United States"
-    except Exception as e:
-        print(f"⚠️ Error reading landmarks.json: {e}")
-        return "San Luis Obispo", "United States"
+    landmark = get_landmark(landmark_id)
+    return landmark.city, landmark.country
 
 async def get_smart_prompt_for_semantic_key(semantic_key: str, question_text: str, existing_config: dict) -> str:
     """Smart prompt generation using hybrid approach: pattern matching → template → LLM fallback"""
@@ -816,21 +896,24 @@ def learn_prompt_from_existing(semantic_key: str, existing_config: dict) -> str:
     
     return None
 
+# Prompt templates per semantic key, built once at import
+PROMPT_TEMPLATES = {
+    "recreation.nearby": "As Roamly, your personal AI tour guide in {city}, {country}, suggest nearby recreational spots around {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Focus on places within walking distance that offer good exercise opportunities.",
+    "dining.nearby": "As Roamly, your personal AI tour guide in {city}, {country}, recommend nearby dining options around {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Suggest local favorites and convenient spots.",
+    "transportation.nearby": "As Roamly, your personal AI tour guide in {city}, {country}, provide transportation information around {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Include parking, public transit, and accessibility options.",
+    "shopping.nearby": "As Roamly, your personal AI tour guide in {city}, {country}, suggest nearby shopping areas around {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Highlight local markets, boutiques, and souvenir shops.",
+    "history.timeline": "As Roamly, your personal AI tour guide in {city}, {country}, share the historical timeline of {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Focus on key events and milestones in chronological order.",
+    "architecture.details": "As Roamly, your personal AI tour guide in {city}, {country}, describe the architectural details of {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Highlight unique design elements and construction techniques.",
+    "culture.traditions": "As Roamly, your personal AI tour guide in {city}, {country}, explain the cultural traditions associated with {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Share local customs and practices.",
+    "events.current": "As Roamly, your personal AI tour guide in {city}, {country}, inform about current events and activities at {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Include upcoming celebrations and special occasions.",
+    "accessibility.info": "As Roamly, your personal AI tour guide in {city}, {country}, provide accessibility information for {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Include wheelchair access, ramps, and special accommodations.",
+    "photography.tips": "As Roamly, your personal AI tour guide in {city}, {country}, share photography tips for {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Suggest best angles, lighting, and unique perspectives."
+}
+DEFAULT_PROMPT_TEMPLATE = "As Roamly, your personal AI tour guide in {city}, {country}, provide helpful information about {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}."
+
 def get_prompt_template(semantic_key: str) -> str:
     """Get prompt template for semantic key - UPDATED with city/country"""
-    prompts = {
-        "recreation.nearby": "As Roamly, your personal AI tour guide in {city}, {country}, suggest nearby recreational spots around {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Focus on places within walking distance that offer good exercise opportunities.",
-        "dining.nearby": "As Roamly, your personal AI tour guide in {city}, {country}, recommend nearby dining options around {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Suggest local favorites and convenient spots.",
-        "transportation.nearby": "As Roamly, your personal AI tour guide in {city}, {country}, provide transportation information around {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Include parking, public transit, and accessibility options.",
-        "shopping.nearby": "As Roamly, your personal AI tour guide in {city}, {country}, suggest nearby shopping areas around {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Highlight local markets, boutiques, and souvenir shops.",
-        "history.timeline": "As Roamly, your personal AI tour guide in {city}, {country}, share the historical timeline of {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Focus on key events and milestones in chronological order.",
-        "architecture.details": "As Roamly, your personal AI tour guide in {city}, {country}, describe the architectural details of {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Highlight unique design elements and construction techniques.",
-        "culture.traditions": "As Roamly, your personal AI tour guide in {city}, {country}, explain the cultural traditions associated with {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Share local customs and practices.",
-        "events.current": "As Roamly, your personal AI tour guide in {city}, {country}, inform about current events and activities at {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Include upcoming celebrations and special occasions.",
-        "accessibility.info": "As Roamly, your personal AI tour guide in {city}, {country}, provide accessibility information for {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Include wheelchair access, ramps, and special accommodations.",
-        "photography.tips": "As Roamly, your personal AI tour guide in {city}, {country}, share photography tips for {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}. Suggest best angles, lighting, and unique perspectives."
-    }
-    return prompts.get(semantic_key, "As Roamly, your personal AI tour guide in {city}, {country}, provide helpful information about {landmark} for a {age_group} traveler from {userCountry} interested in {mappedCategory}.")
+    return PROMPT_TEMPLATES.get(semantic_key, DEFAULT_PROMPT_TEMPLATE)
 
 async def generate_prompt_from_semantic_key(semantic_key: str, question_text: str, existing_config: dict) -> str:
     """Use LLM to generate a prompt template based on semantic key and existing patterns"""
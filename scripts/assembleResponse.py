@@ -1,10 +1,15 @@
 # === assemble_response.py ===
 import boto3
-import json
+import orjson
 import os
+import sys
+from functools import lru_cache
 from dotenv import load_dotenv
 from boto3.dynamodb.conditions import Key
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.aws_clients import BOTO_CONFIG
+
 # Load environment
 load_dotenv()
 
@@ -13,7 +18,8 @@ dynamodb = boto3.resource(
     'dynamodb',
     aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
     aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name="us-east-1"
+    region_name="us-east-1",
+    config=BOTO_CONFIG
 )
 semantic_table = dynamodb.Table("semantic_responses")
 
@@ -21,14 +27,15 @@ semantic_table = dynamodb.Table("semantic_responses")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Load semantic key config
-with open(os.path.join(BASE_DIR, "semantic_config.json"), "r") as f:
-    semantic_config = json.load(f)
+with open(os.path.join(BASE_DIR, "semantic_config.json"), "rb") as f:
+    semantic_config = orjson.loads(f.read())
 
 # Load valid interests
-with open(os.path.join(BASE_DIR, "interests.json"), "r") as f:
-    interest_data = json.load(f)
+with open(os.path.join(BASE_DIR, "interests.json"), "rb") as f:
+    interest_data = orjson.loads(f.read())
 valid_interests = set(interest_data.get("interests", []))
 
+@lru_cache(maxsize=None)
 def get_relevant_keys(landmark_type):
     return semantic_config.get(landmark_type, ["origin.general", "media.references"])
 
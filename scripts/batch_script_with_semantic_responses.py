@@ -1,26 +1,208 @@
 import os
-import json
+import orjson
+import gzip
+import atexit
+import shelve
+import logging
+import logging.handlers
+import queue
 import hashlib
 import asyncio
+import re
+import time
+from collections import Counter, defaultdict, deque
+from itertools import product
+from string import Formatter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
+from functools import lru_cache
 from geopy.geocoders import Nominatim
+from geopy.extra.rate_limiter import RateLimiter
 from geolib import geohash
 import boto3
-from openai import OpenAI
+from botocore.exceptions import ClientError, ConnectionClosedError, EndpointConnectionError, ReadTimeoutError
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, APIStatusError, APITimeoutError, RateLimitError
 
 import sys
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.aws_clients import BATCH_BOTO_CONFIG
 
 # ---- Setup ----
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# All output goes through logging; set LOGLEVEL=DEBUG for per-combination progress.
+# Tasks only enqueue records; a listener thread does the actual stdout writes.
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter("%(message)s"))
+log_listener = logging.handlers.QueueListener(log_queue, log_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+logging.basicConfig(level=os.getenv("LOGLEVEL", "INFO"), handlers=[logging.handlers.QueueHandler(log_queue)])
+logger = logging.getLogger(__name__)
+
+# One pooled keep-alive connection set for every completion, sized above the AIMD concurrency ceiling.
+# SDK retries are off: create_completion owns backoff so every throttle reaches the AIMD limiter.
+client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,
+    http_client=DefaultAsyncHttpxClient(
+        timeout=120,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=100)
+    )
+)
+
+class AIMDLimiter:
+    """Concurrency limit that grows additively while latency is healthy and halves on throttling"""
+
+    def __init__(self, initial, minimum, maximum, target_latency, window=20):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.latencies = deque(maxlen=window)
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency=None, throttled=False):
+        async with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit * 0.5)
+                self.latencies.clear()
+                logger.warning(f"🐢 OpenAI throttled, concurrency limit now {int(self.limit)}")
+            elif latency is not None:
+                self.latencies.append(latency)
+                if sum(self.latencies) / len(self.latencies) <= self.target_latency:
+                    self.limit = min(self.maximum, self.limit + 0.5)
+            self._cond.notify_all()
+
+# Adaptive cap on concurrent in-flight OpenAI completions
+OPENAI_CONCURRENCY = 20
+OPENAI_MIN_CONCURRENCY = 2
+OPENAI_MAX_CONCURRENCY = 64
+OPENAI_TARGET_LATENCY = 4.0  # seconds
+OPENAI_THROTTLE_RETRIES = 5
+openai_limiter = AIMDLimiter(OPENAI_CONCURRENCY, OPENAI_MIN_CONCURRENCY, OPENAI_MAX_CONCURRENCY, OPENAI_TARGET_LATENCY)
+
+class TokenBucket:
+    """Continuously refilling budget of `rate_per_minute` units, shared by all tasks"""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.refill_per_second = rate_per_minute / 60.0
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.refill_per_second)
+                self._refill()
+            self.tokens -= amount
+
+    def observe_remaining(self, remaining):
+        """Never assume more budget than the API reports is left"""
+        self._refill()
+        self.tokens = min(self.tokens, float(remaining))
+
+# Account limits for the model; requests and estimated tokens are drawn from these before each call
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "3500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "160000"))
+request_bucket = TokenBucket(OPENAI_RPM_LIMIT)
+token_bucket = TokenBucket(OPENAI_TPM_LIMIT)
+
+def estimate_tokens(kwargs) -> int:
+    """Rough prompt + completion token estimate (~4 characters per token)"""
+    prompt_chars = sum(len(m.get("content", "")) for m in kwargs.get("messages", []))
+    return prompt_chars // 4 + kwargs.get("max_tokens", 500)
+
+def is_throttle_error(e) -> bool:
+    if isinstance(e, (RateLimitError, APITimeoutError)):
+        return True
+    return isinstance(e, APIStatusError) and e.status_code >= 500
+
+def retry_after_seconds(e, default) -> float:
+    response = getattr(e, "response", None)
+    try:
+        return float(response.headers.get("retry-after", default))
+    except (AttributeError, TypeError, ValueError):
+        return default
+
+# Pause new requests once less than this fraction of the rate-limit window remains
+RATE_LIMIT_HEADROOM = 0.1
+RESET_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+RESET_UNIT_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+# Monotonic time before which no new completion is started
+rate_limit_resume_at = 0.0
+
+def parse_reset_seconds(value) -> float:
+    """Parse OpenAI reset durations such as '20ms', '1s' or '6m0s' into seconds"""
+    return sum(float(n) * RESET_UNIT_SECONDS[unit] for n, unit in RESET_DURATION_RE.findall(value or ""))
+
+def observe_rate_limit_headers(headers):
+    """Schedule a pause until the window resets when remaining requests or tokens run low"""
+    global rate_limit_resume_at
+    for kind in ("requests", "tokens"):
+        try:
+            remaining = int(headers[f"x-ratelimit-remaining-{kind}"])
+            limit = int(headers[f"x-ratelimit-limit-{kind}"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        (request_bucket if kind == "requests" else token_bucket).observe_remaining(remaining)
+        if remaining <= max(2, limit * RATE_LIMIT_HEADROOM):
+            pause = parse_reset_seconds(headers.get(f"x-ratelimit-reset-{kind}"))
+            if pause > 0:
+                rate_limit_resume_at = max(rate_limit_resume_at, time.monotonic() + pause)
+                logger.info(f"⏸️ {remaining}/{limit} OpenAI {kind} left, pausing {pause:.1f}s")
+
+async def create_completion(**kwargs):
+    """Create a chat completion under the rate budgets and AIMD limiter, backing off and retrying when throttled"""
+    est_tokens = estimate_tokens(kwargs)
+    for attempt in range(OPENAI_THROTTLE_RETRIES + 1):
+        delay = rate_limit_resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await request_bucket.acquire()
+        await token_bucket.acquire(est_tokens)
+        await openai_limiter.acquire()
+        start = time.monotonic()
+        try:
+            raw = await client.chat.completions.with_raw_response.create(**kwargs)
+            completion = raw.parse()
+            observe_rate_limit_headers(raw.headers)
+        except Exception as e:
+            throttled = is_throttle_error(e)
+            await openai_limiter.release(throttled=throttled)
+            if not throttled or attempt == OPENAI_THROTTLE_RETRIES:
+                raise
+            await asyncio.sleep(retry_after_seconds(e, default=min(2 ** attempt, 60)))
+            continue
+        await openai_limiter.release(latency=time.monotonic() - start)
+        return completion
 
 dynamodb = boto3.resource(
     'dynamodb',
     aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
     aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name='us-east-2'
+    region_name='us-east-2',
+    config=BATCH_BOTO_CONFIG
 )
 semantic_table = dynamodb.Table("semantic_responses")
 landmark_table = dynamodb.Table("Landmarks")
@@ -29,20 +211,48 @@ s3_client = boto3.client(
     "s3",
     aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
     aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("AWS_REGION")
+    region_name=os.getenv("AWS_REGION"),
+    config=BATCH_BOTO_CONFIG
 )
 S3_BUCKET = os.getenv("S3_BUCKET_NAME")
 S3_URL_BASE = os.getenv("S3_URL_BASE")
 
+# Errors worth retrying once botocore's own retries are exhausted
+RETRYABLE_AWS_ERROR_CODES = {
+    "ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded",
+    "InternalServerError", "InternalError", "ServiceUnavailable", "SlowDown"
+}
+
+def is_retryable_aws_error(e) -> bool:
+    if isinstance(e, ClientError):
+        return e.response.get("Error", {}).get("Code") in RETRYABLE_AWS_ERROR_CODES
+    return isinstance(e, (EndpointConnectionError, ConnectionClosedError, ReadTimeoutError))
+
+# Exponential backoff around whole S3/DynamoDB operations so a transient failure doesn't drop a semantic key
+aws_retry = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential(multiplier=1, max=30),
+    retry=retry_if_exception(is_retryable_aws_error),
+    reraise=True
+)
+
+# Shared pool so S3 uploads and DynamoDB writes overlap with response generation
+UPLOAD_POOL = ThreadPoolExecutor(max_workers=16)
+# Single worker: geocoding stays within Nominatim's rate limit and the landmark batch writer stays single-threaded
+METADATA_POOL = ThreadPoolExecutor(max_workers=1)
+
+# Reruns skip landmarks and semantic responses that are already stored; FORCE_REFRESH=true regenerates everything
+FORCE_REFRESH = os.getenv("FORCE_REFRESH", "false").lower() in ("1", "true", "yes")
+
 def create_semantic_responses_table_if_not_exists():
     """Create semantic_responses table if it doesn't exist"""
     try:
         # Try to describe the table to see if it exists
         semantic_table.load()
-        print("✅ Semantic_responses table already exists")
+        logger.info("✅ Semantic_responses table already exists")
     except Exception as e:
         if "ResourceNotFoundException" in str(e):
-            print("🔄 Creating semantic_responses table...")
+            logger.info("🔄 Creating semantic_responses table...")
             
             # Create the table
             table = dynamodb.create_table(
@@ -72,25 +282,30 @@ def create_semantic_responses_table_if_not_exists():
             
             # Wait for table to be created
             table.meta.client.get_waiter('table_exists').wait(TableName='semantic_responses')
-            print("✅ Semantic_responses table created successfully")
+            logger.info("✅ Semantic_responses table created successfully")
         else:
-            print(f"❌ Error checking/creating table: {e}")
+            logger.error(f"❌ Error checking/creating table: {e}")
             raise e
 
 # === Load semantic config and landmarks from S3 ===
 try:
     from utils.s3_config_reader import get_semantic_config_from_s3, get_landmarks_from_s3
-    print("📥 Loading configuration from S3...")
-    semantic_config = get_semantic_config_from_s3()
-    landmark_objs = get_landmarks_from_s3()
-    print("✅ Configuration loaded from S3")
+    logger.info("📥 Loading configuration from S3...")
+    # Fetch both config files concurrently instead of paying two sequential round trips
+    with ThreadPoolExecutor(max_workers=2) as config_pool:
+        semantic_config_future = config_pool.submit(get_semantic_config_from_s3)
+        landmarks_future = config_pool.submit(get_landmarks_from_s3)
+        semantic_config = semantic_config_future.result()
+        landmark_objs = landmarks_future.result()
+    logger.info("✅ Configuration loaded from S3")
 except Exception as e:
-    print(f"⚠️ S3 config reader not available or failed ({e}), falling back to local files...")
-    with open("semantic_config.json", "r") as f:
-        semantic_config = json.load(f)
-    with open("landmarks.json", "r") as f:
-        landmark_objs = json.load(f)
+    logger.warning(f"⚠️ S3 config reader not available or failed ({e}), falling back to local files...")
+    with open("semantic_config.json", "rb") as f:
+        semantic_config = orjson.loads(f.read())
+    with open("landmarks.json", "rb") as f:
+        landmark_objs = orjson.loads(f.read())
 
+@lru_cache(maxsize=None)
 def get_relevant_keys(landmark_type):
     return semantic_config.get(landmark_type, ["origin.general", "media.references"])
 
@@ -102,177 +317,586 @@ languages = ["English"]
 countries = ["United States", "India"]
 age_groups = ["young", "old"]
 
-def get_coordinates(place):
-    geolocator = Nominatim(user_agent="roamly_app")
-    location = geolocator.geocode(place)
-    return (location.latitude, location.longitude) if location else (None, None)
+# Every (country, category, age_group) combination, built once and reused for each semantic key
+COMBOS = list(product(countries, categories, age_groups))
+
+# One shared geocoder, throttled to Nominatim's 1 request/second usage policy
+geolocator = Nominatim(user_agent="roamly_app", timeout=10)
+geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1, max_retries=2, swallow_exceptions=False)
+
+# Persistent prompt -> (narration, facts) cache so reruns never pay for the same prompt twice
+PROMPT_CACHE_PATH = os.path.expanduser(os.getenv("PROMPT_CACHE_PATH", "~/.roamly_prompt_cache"))
+_prompt_cache = shelve.open(PROMPT_CACHE_PATH)
+atexit.register(_prompt_cache.close)
+
+def prompt_cache_key(prompt: str) -> str:
+    """Key on the full request (model, messages, temperature, max_tokens...) so changing any of them misses"""
+    body = orjson.dumps(completion_body(prompt), option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def get_cached_response(prompt: str):
+    if FORCE_REFRESH:
+        return None
+    return _prompt_cache.get(prompt_cache_key(prompt))
+
+def cache_responses(prompt_responses):
+    for prompt, response in prompt_responses:
+        _prompt_cache[prompt_cache_key(prompt)] = response
+    _prompt_cache.sync()
 
+# Must match the precision the API queries the Landmarks table with
+GEOHASH_PRECISION = 6
+
+# Persistent geocode cache so reruns over the same landmarks skip Nominatim entirely
+GEOCACHE_PATH = os.path.expanduser(os.getenv("GEOCACHE_PATH", "~/.roamly_geocache"))
+GEOCACHE_TTL_SECONDS = 90 * 24 * 3600
+GEOCACHE_MAX_ENTRIES = 100000
+_geo_cache = shelve.open(GEOCACHE_PATH)
+atexit.register(_geo_cache.close)
+
+@lru_cache(maxsize=4096)
+def get_location(place):
+    """Geocode a place once, returning (lat, lon, geohash at GEOHASH_PRECISION)"""
+    key = place.strip().lower()
+    cached = _geo_cache.get(key)
+    if cached and time.time() - cached["cached_at"] < GEOCACHE_TTL_SECONDS:
+        gh = cached["geohash"]
+        if len(gh) != GEOHASH_PRECISION:
+            gh = geohash.encode(cached["lat"], cached["lon"], GEOHASH_PRECISION)
+        return cached["lat"], cached["lon"], gh
+
+    location = geocode(place)
+    if not location:
+        return None, None, None
+    lat, lon = location.latitude, location.longitude
+    gh = geohash.encode(lat, lon, GEOHASH_PRECISION)
+    if key in _geo_cache or len(_geo_cache) < GEOCACHE_MAX_ENTRIES:
+        _geo_cache[key] = {"lat": lat, "lon": lon, "geohash": gh, "cached_at": time.time()}
+        _geo_cache.sync()
+    return lat, lon, gh
+
+@aws_retry
 def upload_json_to_s3(data: dict, s3_key: str) -> str:
-    local_path = os.path.join("/tmp", s3_key.split("/")[-1])
-    with open(local_path, "w") as f:
-        json.dump(data, f)
-    s3_client.upload_file(
-        local_path,
-        S3_BUCKET,
-        s3_key,
-        ExtraArgs={"ContentType": "application/json"}
+    """Upload JSON gzip-compressed straight from memory; S3 serves it with Content-Encoding: gzip"""
+    s3_client.put_object(
+        Bucket=S3_BUCKET,
+        Key=s3_key,
+        Body=gzip.compress(orjson.dumps(data)),
+        ContentType="application/json",
+        ContentEncoding="gzip"
     )
     return S3_URL_BASE + s3_key
 
-def insert_landmark_metadata(landmark_obj):
+def insert_landmark_metadata(landmark_obj, landmark_writer):
     name = landmark_obj["name"]
     landmark_type = landmark_obj.get("type", "unknown")
-    lat, lon = get_coordinates(name)
+    if not FORCE_REFRESH and landmark_table.get_item(
+        Key={"landmark_id": name.replace(" ", "_")}, ProjectionExpression="landmark_id"
+    ).get("Item"):
+        logger.debug(f"⏭️ Landmark metadata for {name} already exists")
+        return
+
+    lat, lon, geohash_code = get_location(name)
     if not lat or not lon:
-        print(f"❌ Skipping {name} due to missing coordinates")
+        logger.error(f"❌ Skipping {name} due to missing coordinates")
         return
 
-    geohash_code = geohash.encode(lat, lon, precision=2)
-    landmark_table.put_item(Item={
+    landmark_writer.put_item(Item={
         "landmark_id": name.replace(" ", "_"),
         "name": name,
         "type": landmark_type,
         "coordinates": {"lat": str(lat), "lng": str(lon)},
         "geohash": geohash_code
     })
-    print(f"✅ Inserted landmark metadata for {name}")
+    logger.info(f"✅ Queued landmark metadata for {name}")
 
 def sanitize_filename(s: str) -> str:
     return s.replace(" ", "_").replace("/", "_").lower()
 
-def insert_consolidated_semantic_response(landmark, semantic_key, consolidated_data):
-    """Insert consolidated semantic response with new structure"""
-    safe_landmark = sanitize_filename(landmark)
-    safe_key = sanitize_filename(semantic_key)
-    
-    filename = f"{safe_landmark}_{safe_key}.json"
-    s3_key = f"semantic_responses/{filename}"
+def semantic_s3_key(safe_landmark, semantic_key) -> str:
+    return f"semantic_responses/{safe_landmark}_{sanitize_filename(semantic_key)}.json"
+
+# BatchGetItem accepts at most 100 keys per call
+DYNAMO_BATCH_GET_SIZE = 100
+
+@aws_retry
+def fetch_stored_semantic_keys(keys) -> set:
+    """Return the (landmark_id, semantic_key) pairs that already have a semantic_responses item"""
+    stored = set()
+    request = {semantic_table.name: {
+        "Keys": [{"landmark_id": landmark_id, "semantic_key": semantic_key} for landmark_id, semantic_key in keys],
+        "ProjectionExpression": "landmark_id, semantic_key"
+    }}
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        stored.update(
+            (item["landmark_id"], item["semantic_key"])
+            for item in response.get("Responses", {}).get(semantic_table.name, [])
+        )
+        request = response.get("UnprocessedKeys") or None
+    return stored
+
+def find_existing_semantic_responses(landmark_objs) -> set:
+    """
+    Return the S3 keys of semantic responses that are fully stored, i.e. have a semantic_responses item.
+    An uploaded object whose DynamoDB write failed is not counted, so a rerun writes its pointer.
+    """
+    if FORCE_REFRESH:
+        return set()
+    s3_keys = {
+        (landmark_obj["name"].replace(" ", "_"), semantic_key): semantic_s3_key(sanitize_filename(landmark_obj["name"]), semantic_key)
+        for landmark_obj in landmark_objs
+        for semantic_key in get_relevant_keys(landmark_obj["type"])
+    }
+    keys = list(s3_keys)
+    chunks = [keys[i:i + DYNAMO_BATCH_GET_SIZE] for i in range(0, len(keys), DYNAMO_BATCH_GET_SIZE)]
+    stored = set().union(*UPLOAD_POOL.map(fetch_stored_semantic_keys, chunks))
+    existing = {s3_keys[key] for key in stored if key in s3_keys}
+    logger.info(f"⏭️ {len(existing)}/{len(s3_keys)} semantic responses already exist and will be skipped")
+    return existing
+
+def insert_consolidated_semantic_response(landmark, landmark_id, safe_landmark, semantic_key, consolidated_data):
+    """Upload consolidated semantic response and return its DynamoDB item for batch writing"""
+    s3_key = semantic_s3_key(safe_landmark, semantic_key)
     
     json_url = upload_json_to_s3(consolidated_data, s3_key)
     
-    # Store reference in DynamoDB with simplified structure
+    # Reference to store in DynamoDB with simplified structure
     item = {
-        "landmark_id": landmark.replace(" ", "_"),
+        "landmark_id": landmark_id,
         "semantic_key": semantic_key,
         "json_url": json_url
     }
     
-    semantic_table.put_item(Item=item)
-    print(f"✅ Inserted consolidated semantic response: {semantic_key} for {landmark}")
+    logger.debug(f"✅ Uploaded consolidated semantic response: {semantic_key} for {landmark}")
+    return item
 
-async def generate_and_store_consolidated_semantics(landmark_obj):
-    landmark = landmark_obj["name"]
+@aws_retry
+def write_semantic_items(items):
+    """Write semantic_responses items in BatchWriteItem calls of up to 25 (unprocessed items are retried)"""
+    # overwrite_by_pkeys drops duplicate keys within a batch, which BatchWriteItem would otherwise reject
+    with semantic_table.batch_writer(overwrite_by_pkeys=["landmark_id", "semantic_key"]) as batch:
+        for item in items:
+            batch.put_item(Item=item)
+    logger.info(f"✅ Inserted {len(items)} consolidated semantic responses")
+
+# Stored responses are buffered and written every SEMANTIC_FLUSH_SIZE items, or SEMANTIC_FLUSH_SECONDS
+# after the oldest buffered item arrived, whichever comes first
+SEMANTIC_FLUSH_SIZE = 25
+SEMANTIC_FLUSH_SECONDS = 2.0
+SEMANTIC_QUEUE_SIZE = 200
+
+async def flush_semantic_items(semantic_queue):
+    """Drain the queue into batched DynamoDB writes until a None sentinel arrives, then flush the rest"""
+    loop = asyncio.get_running_loop()
+    pending = []
+    flush_at = None
+    done = False
+    while not done:
+        # Wait only until the oldest pending item is due; with nothing pending, wait for the next item
+        timeout = max(0.0, flush_at - loop.time()) if pending else None
+        try:
+            item = await asyncio.wait_for(semantic_queue.get(), timeout=timeout)
+            if item is None:
+                done = True
+            else:
+                if not pending:
+                    flush_at = loop.time() + SEMANTIC_FLUSH_SECONDS
+                pending.append(item)
+        except asyncio.TimeoutError:
+            pass
+        if pending and (done or len(pending) >= SEMANTIC_FLUSH_SIZE or loop.time() >= flush_at):
+            batch, pending = pending, []
+            try:
+                await asyncio.to_thread(write_semantic_items, batch)
+            except Exception as e:
+                # The S3 objects are uploaded but unreferenced; the next run regenerates these keys
+                # (from the prompt cache) because the skip check looks for the DynamoDB item
+                logger.error(f"❌ Failed to write {len(batch)} semantic responses, they will be redone on the next run: {e}")
+
+# Responses come back as {"narration": ..., "facts": {...}} so facts never need a separate pass
+STRUCTURED_OUTPUT_INSTRUCTIONS = (
+    'Return a JSON object of the form {"narration": "<response text>", "facts": {"<fact>": "<value>"}}. '
+    "Put any FACTS section the instructions ask for into \"facts\" instead of the narration."
+)
+
+# Output budget per combination; a grid call gets the same budget per cell it contains
+COMBO_MAX_TOKENS = 500
+GRID_MAX_TOKENS = 4000
+# Cells per grid call, keeping one cell of headroom for the JSON keys and wrapping
+GRID_CHUNK_SIZE = max(1, GRID_MAX_TOKENS // COMBO_MAX_TOKENS - 1)
+
+def parse_structured_response(obj) -> tuple:
+    """Split a structured response into (narration, facts), dropping malformed facts"""
+    if not isinstance(obj, dict):
+        return None, {}
+    narration = obj.get("narration")
+    facts = obj.get("facts")
+    if not isinstance(narration, str) or not narration.strip():
+        return None, {}
+    if not isinstance(facts, dict):
+        facts = {}
+    if not facts:
+        # The model sometimes still appends the template's FACTS section to the narration
+        description, sep, facts_text = narration.rpartition("FACTS:")
+        if sep:
+            try:
+                inline_facts = orjson.loads(facts_text.strip())
+            except orjson.JSONDecodeError:
+                inline_facts = None
+            if isinstance(inline_facts, dict):
+                narration, facts = description, inline_facts
+    return narration.strip(), {k: v for k, v in facts.items() if isinstance(v, (str, int, float))}
+
+def completion_body(prompt: str) -> dict:
+    """Chat completion parameters for one combination, shared by real-time calls and Batch API requests"""
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": "You are a friendly and knowledgeable travel guide."},
+            {"role": "user", "content": f"{prompt}\n\n{STRUCTURED_OUTPUT_INSTRUCTIONS}"}
+        ],
+        "response_format": {"type": "json_object"},
+        "temperature": 0.7,
+        "max_tokens": COMBO_MAX_TOKENS
+    }
+
+async def generate_landmark_response(prompt: str) -> tuple:
+    """Generate one travel-guide response as (narration, facts), limited by the shared OpenAI limiter"""
+    completion = await create_completion(**completion_body(prompt))
+    narration, facts = parse_structured_response(orjson.loads(completion.choices[0].message.content))
+    if narration is None:
+        raise ValueError("Structured response is missing its narration")
+    return narration, facts
+
+def combo_id(country, category, age_group) -> str:
+    return f"{country}|{category}|{age_group}"
+
+async def generate_grid_chunk(combo_prompts) -> dict:
+    """Generate (narration, facts) for a few combinations in one structured-output completion, keyed by combo_id"""
+    audiences = "\n\n".join(
+        f"Audience id: {combo_id(country, category, age_group)}\nInstructions: {prompt}"
+        for country, category, age_group, prompt in combo_prompts
+    )
+    grid_prompt = (
+        "Write one response for each audience below, following that audience's instructions exactly. "
+        "Return a JSON object mapping each audience id to an object of the form "
+        '{"narration": "<response text>", "facts": {"<fact>": "<value>"}}, '
+        "putting any FACTS section the instructions ask for into \"facts\".\n\n" + audiences
+    )
+    try:
+        completion = await create_completion(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "You are a friendly and knowledgeable travel guide."},
+                {"role": "user", "content": grid_prompt}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.7,
+            max_tokens=GRID_MAX_TOKENS
+        )
+        if completion.choices[0].finish_reason == "length":
+            raise ValueError("grid response hit the output token limit")
+        grid = orjson.loads(completion.choices[0].message.content)
+        parsed = {k: parse_structured_response(v) for k, v in grid.items()}
+        return {k: v for k, v in parsed.items() if v[0] is not None}
+    except Exception as e:
+        logger.warning(f"⚠️ Grid generation failed, falling back to per-combination calls: {e}")
+        return {}
+
+async def generate_grid_responses(combo_prompts) -> dict:
+    """Generate the grid in concurrent chunks sized to the output budget, keyed by combo_id"""
+    chunks = await asyncio.gather(*[
+        generate_grid_chunk(combo_prompts[i:i + GRID_CHUNK_SIZE])
+        for i in range(0, len(combo_prompts), GRID_CHUNK_SIZE)
+    ])
+    return {k: v for chunk in chunks for k, v in chunk.items()}
+
+@lru_cache(maxsize=None)
+def compile_template(template: str) -> tuple:
+    """Parse a str.format template once into (literal, field_name) parts; field_name is None after the last field"""
+    parts = []
+    for literal, field_name, format_spec, conversion in Formatter().parse(template):
+        if format_spec or conversion:
+            raise ValueError(f"Unsupported format spec in prompt template field {field_name!r}")
+        parts.append((literal, field_name))
+    return tuple(parts)
+
+def bind_template(parts, values) -> tuple:
+    """Partially evaluate compiled parts: substitute the given fields and merge them into the literals"""
+    bound = []
+    pending = ""
+    for literal, field_name in parts:
+        pending += literal
+        if field_name in values:
+            pending += str(values[field_name])
+        else:
+            bound.append((pending, field_name))
+            pending = ""
+    if pending:
+        bound.append((pending, None))
+    return tuple(bound)
+
+def render_template(parts, values) -> str:
+    return "".join(literal + (str(values[field_name]) if field_name is not None else "") for literal, field_name in parts)
+
+def build_combo_prompts(landmark_obj, semantic_key, combos) -> list:
+    """Format the semantic key's template for every combination as (country, category, age_group, prompt)"""
     landmark_type = landmark_obj["type"]
-    city = landmark_obj.get("city", "a city")
+    template = semantic_config.get(landmark_type, {}).get(semantic_key)
+    if not template:
+        logger.debug(f"⚠️ Skipping missing prompt for {landmark_type} → {semantic_key}")
+        return []
+    # Parse the template once and bake in the landmark fields; each combination only fills the rest
+    parts = bind_template(
+        compile_template(template),
+        {"city": landmark_obj.get("city", "a city"), "landmark": landmark_obj["name"]}
+    )
+    return [
+        (country, category, age_group, render_template(parts, {
+            "country": country,
+            "userCountry": country,
+            "mappedCategory": category,  # Use category directly, no mapping needed
+            "age_group": age_group
+        }))
+        for country, category, age_group in combos
+    ]
+
+def unique_combo_prompts(combo_prompts) -> list:
+    """Templates that ignore some fields yield identical prompts; keep one combination per distinct prompt"""
+    return list({cp[3]: cp for cp in combo_prompts}.values())
 
-    semantic_keys = get_relevant_keys(landmark_type)
+def batch_custom_id(landmark_id, semantic_key, cp) -> str:
+    return f"{landmark_id}|{semantic_key}|{combo_id(*cp[:3])}"
+
+# === OpenAI Batch API (opt-in: half price, no real-time RPM ceiling, results within 24h) ===
+USE_OPENAI_BATCH_API = os.getenv("USE_OPENAI_BATCH_API", "false").lower() in ("1", "true", "yes")
+BATCH_POLL_SECONDS = 60
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+async def run_batch_generation(landmark_objs, combos, existing_keys) -> dict:
+    """Submit every distinct prompt as one OpenAI batch and return (narration, facts) keyed by custom_id"""
+    lines = []
+    for landmark_obj in landmark_objs:
+        landmark_id = landmark_obj["name"].replace(" ", "_")
+        safe_landmark = sanitize_filename(landmark_obj["name"])
+        for semantic_key in get_relevant_keys(landmark_obj["type"]):
+            if semantic_s3_key(safe_landmark, semantic_key) in existing_keys:
+                continue
+            for cp in unique_combo_prompts(build_combo_prompts(landmark_obj, semantic_key, combos)):
+                if get_cached_response(cp[3]) is not None:
+                    continue
+                lines.append(orjson.dumps({
+                    "custom_id": batch_custom_id(landmark_id, semantic_key, cp),
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": completion_body(cp[3])
+                }))
+    if not lines:
+        return {}
+
+    # Batch endpoints bypass create_completion, so they keep the SDK's own retries
+    batch_client = client.with_options(max_retries=3)
+    batch_file = await batch_client.files.create(file=("batch.jsonl", b"\n".join(lines)), purpose="batch")
+    batch = await batch_client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.info(f"📦 Submitted OpenAI batch {batch.id} with {len(lines)} requests")
+    while batch.status not in BATCH_TERMINAL_STATUSES:
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+        batch = await batch_client.batches.retrieve(batch.id)
+        logger.info(f"⏳ OpenAI batch {batch.id}: {batch.status}")
+
+    if not batch.output_file_id:
+        logger.warning(f"⚠️ OpenAI batch {batch.id} ended as {batch.status} with no output, using real-time calls")
+        return {}
+    output = await batch_client.files.content(batch.output_file_id)
+
+    results = {}
+    for line in output.content.splitlines():
+        record = orjson.loads(line)
+        body = (record.get("response") or {}).get("body") or {}
+        try:
+            narration, facts = parse_structured_response(orjson.loads(body["choices"][0]["message"]["content"]))
+        except (KeyError, IndexError, TypeError, orjson.JSONDecodeError):
+            continue
+        if narration is not None:
+            results[record["custom_id"]] = (narration, facts)
+    logger.info(f"✅ OpenAI batch {batch.id} returned {len(results)}/{len(lines)} usable responses")
+    return results
+
+async def generate_consolidated_semantic(
+    landmark_obj, landmark_id, safe_landmark, semantic_key, combos, batch_results, semantic_queue
+):
+    """Generate one semantic key's responses for every combination, upload them and queue the DynamoDB item"""
+    landmark = landmark_obj["name"]
+    logger.info(f"🔄 Generating responses for {landmark} - {semantic_key}")
     
-    for semantic_key in semantic_keys:
-        print(f"🔄 Generating responses for {landmark} - {semantic_key}")
-        
-        # Initialize consolidated data structure
-        consolidated_data = {
-            "landmark": landmark,
-            "semantic_key": semantic_key,
-            "responses": [],
-            "extracted_details": {},
-            "specific_Youtubes": {},
-            "last_updated_utc": datetime.utcnow().isoformat() + "Z"
+    # Initialize consolidated data structure
+    consolidated_data = {
+        "landmark": landmark,
+        "semantic_key": semantic_key,
+        "responses": [],
+        "extracted_details": {},
+        "specific_Youtubes": {},
+        "last_updated_utc": datetime.utcnow().isoformat() + "Z"
+    }
+    
+    # Track facts across all responses for this semantic key
+    fact_counters = defaultdict(Counter)
+    
+    combo_prompts = build_combo_prompts(landmark_obj, semantic_key, combos)
+    unique_prompts = unique_combo_prompts(combo_prompts)
+    if len(unique_prompts) < len(combo_prompts):
+        logger.debug(f"♻️ {len(combo_prompts)} combinations share {len(unique_prompts)} distinct prompts")
+    
+    # Prompts answered on a previous run come from the persistent cache
+    cached_responses = {}
+    for cp in unique_prompts:
+        cached = get_cached_response(cp[3])
+        if cached is not None:
+            cached_responses[combo_id(*cp[:3])] = cached
+    to_generate = [cp for cp in unique_prompts if combo_id(*cp[:3]) not in cached_responses]
+    
+    if not to_generate:
+        grid_responses = {}
+    elif batch_results is not None:
+        # Take what the Batch API produced; anything it missed is generated in real time below
+        grid_responses = {
+            combo_id(*cp[:3]): batch_results[batch_custom_id(landmark_id, semantic_key, cp)]
+            for cp in to_generate
+            if batch_custom_id(landmark_id, semantic_key, cp) in batch_results
         }
+    else:
+        # Generate the grid in budget-sized chunks, then fill any prompts the model omitted
+        grid_responses = await generate_grid_responses(to_generate)
+    missing = [cp for cp in to_generate if combo_id(*cp[:3]) not in grid_responses]
+    if missing:
+        logger.info(f"🔁 Generating {len(missing)} missing combinations individually")
+    fallback_responses = await asyncio.gather(
+        *[generate_landmark_response(prompt) for _, _, _, prompt in missing],
+        return_exceptions=True
+    )
+    for cp, full_response in zip(missing, fallback_responses):
+        grid_responses[combo_id(*cp[:3])] = full_response
+    cache_responses(
+        (cp[3], grid_responses[combo_id(*cp[:3])])
+        for cp in to_generate
+        if not isinstance(grid_responses[combo_id(*cp[:3])], Exception)
+    )
+    grid_responses.update(cached_responses)
+    responses_by_prompt = {cp[3]: grid_responses[combo_id(*cp[:3])] for cp in unique_prompts}
+    full_responses = [responses_by_prompt[cp[3]] for cp in combo_prompts]
+    
+    for (country, category, age_group, _), full_response in zip(combo_prompts, full_responses):
+        if isinstance(full_response, Exception):
+            logger.warning(f"❌ Failed to generate OpenAI response for {semantic_key}: {full_response}")
+            continue
         
-        # Track facts across all responses for this semantic key
-        fact_counters = {}
-        
-        # Generate responses for all combinations
-        for country in countries:
-            for category in categories:
-                for age_group in age_groups:
-                    template = semantic_config.get(landmark_type, {}).get(semantic_key)
-                    if not template:
-                        print(f"⚠️ Skipping missing prompt for {landmark_type} → {semantic_key}")
-                        continue
-
-                    prompt = template.format(
-                        city=city,
-                        country=country,
-                        userCountry=country,
-                        mappedCategory=category,  # Use category directly, no mapping needed
-                        landmark=landmark,
-                        age_group=age_group
-                    )
-
-                    try:
-                        completion = client.chat.completions.create(
-                            model="gpt-3.5-turbo",
-                            messages=[
-                                {"role": "system", "content": "You are a friendly and knowledgeable travel guide."},
-                                {"role": "user", "content": prompt}
-                            ],
-                            temperature=0.7,
-                            max_tokens=500
-                        )
-                        full_response = completion.choices[0].message.content.strip()
-                        
-                        # Parse response to separate description from facts
-                        description = full_response
-                        facts = {}
-                        
-                        if "FACTS:" in full_response:
-                            try:
-                                description, facts_section = full_response.split("FACTS:", 1)
-                                # Extract JSON from the facts section
-                                facts_text = facts_section.strip()
-                                facts = json.loads(facts_text)
-                                
-                                # Aggregate facts
-                                for fact_key, fact_value in facts.items():
-                                    if fact_key not in fact_counters:
-                                        fact_counters[fact_key] = {}
-                                    if fact_value not in fact_counters[fact_key]:
-                                        fact_counters[fact_key][fact_value] = 0
-                                    fact_counters[fact_key][fact_value] += 1
-                                    
-                            except Exception as e:
-                                print(f"⚠️ Failed to parse facts from response: {e}")
-                                description = full_response
-                        else:
-                            print(f"⚠️ No FACTS section found in response for {semantic_key}")
-                        
-                        # Add to responses array (only the description part)
-                        consolidated_data["responses"].append({
-                            "user_country": country,
-                            "user_age": age_group,
-                            "mapped_category": category,  # Use category directly
-                            "response": description.strip()
-                        })
-                        
-                        print(f"✅ Generated response for {country}/{category}/{age_group}")
-                        
-                    except Exception as e:
-                        print(f"❌ Failed to generate OpenAI response for {semantic_key}: {e}")
+        # Narration and facts arrive already separated in the structured output
+        description, facts = full_response
+        if not facts:
+            logger.debug(f"⚠️ No facts returned in response for {semantic_key}")
         
-        # Aggregate the most common facts for this semantic key
-        aggregated_facts = {}
-        for fact_key, value_counts in fact_counters.items():
-            if value_counts:
-                # Get the most common value for this fact
-                most_common_value = max(value_counts.items(), key=lambda x: x[1])[0]
-                aggregated_facts[fact_key] = most_common_value
+        # Aggregate facts
+        for fact_key, fact_value in facts.items():
+            fact_counters[fact_key][fact_value] += 1
         
-        # Add aggregated facts to the consolidated data
-        consolidated_data["extracted_details"] = aggregated_facts
-        print(f"📊 Extracted {len(aggregated_facts)} facts for {semantic_key}")
+        # Add to responses array (only the description part)
+        consolidated_data["responses"].append({
+            "user_country": country,
+            "user_age": age_group,
+            "mapped_category": category,  # Use category directly
+            "response": description
+        })
         
-        # Store the consolidated response
-        insert_consolidated_semantic_response(landmark, semantic_key, consolidated_data)
+        logger.debug(f"✅ Generated response for {country}/{category}/{age_group}")
+    
+    # Aggregate the most common facts for this semantic key
+    aggregated_facts = {
+        fact_key: value_counts.most_common(1)[0][0]
+        for fact_key, value_counts in fact_counters.items()
+    }
+    
+    # Add aggregated facts to the consolidated data
+    consolidated_data["extracted_details"] = aggregated_facts
+    logger.info(f"📊 Extracted {len(aggregated_facts)} facts for {semantic_key}")
+    
+    # Upload on the shared pool without blocking the event loop, then hand the reference to the flusher
+    item = await asyncio.wrap_future(UPLOAD_POOL.submit(
+        insert_consolidated_semantic_response,
+        landmark, landmark_id, safe_landmark, semantic_key, consolidated_data
+    ))
+    await semantic_queue.put(item)
+
+async def generate_and_store_consolidated_semantics(
+    landmark_obj, combos, semantic_queue, batch_results=None, existing_keys=frozenset()
+):
+    landmark = landmark_obj["name"]
+    # Derived once per landmark and shared by every semantic key's upload
+    landmark_id = landmark.replace(" ", "_")
+    safe_landmark = sanitize_filename(landmark)
+    semantic_keys = []
+    for semantic_key in get_relevant_keys(landmark_obj["type"]):
+        if semantic_s3_key(safe_landmark, semantic_key) in existing_keys:
+            logger.debug(f"⏭️ Skipping {landmark} - {semantic_key}, response already stored")
+        else:
+            semantic_keys.append(semantic_key)
+    
+    # Every semantic key generates and uploads concurrently; the OpenAI limiter bounds in-flight calls
+    results = await asyncio.gather(
+        *[
+            generate_consolidated_semantic(
+                landmark_obj, landmark_id, safe_landmark, semantic_key, combos, batch_results, semantic_queue
+            )
+            for semantic_key in semantic_keys
+        ],
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"❌ Failed to store consolidated response for {landmark}: {result}")
+
+async def run_landmarks(semantic_queue):
+    # Landmark items go out 25 per BatchWriteItem call; overwrite_by_pkeys drops duplicate keys within a batch
+    with landmark_table.batch_writer(overwrite_by_pkeys=["landmark_id"]) as landmark_writer:
+        # Metadata inserts queue on their own worker while every landmark's generation runs concurrently;
+        # OpenAI concurrency is still bounded by the shared limiter
+        loop = asyncio.get_running_loop()
+        tasks = [
+            loop.run_in_executor(METADATA_POOL, insert_landmark_metadata, landmark_obj, landmark_writer)
+            for landmark_obj in landmark_objs
+        ]
+        existing_keys = await asyncio.to_thread(find_existing_semantic_responses, landmark_objs)
+        batch_results = (
+            await run_batch_generation(landmark_objs, COMBOS, existing_keys) if USE_OPENAI_BATCH_API else None
+        )
+        tasks.extend(
+            generate_and_store_consolidated_semantics(
+                landmark_obj, COMBOS, semantic_queue, batch_results, existing_keys
+            )
+            for landmark_obj in landmark_objs
+        )
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"❌ Landmark task failed: {result}")
 
 async def main():
     # Create table if it doesn't exist
     create_semantic_responses_table_if_not_exists()
     
-    for landmark_obj in landmark_objs:
-        insert_landmark_metadata(landmark_obj)
-        await generate_and_store_consolidated_semantics(landmark_obj)
+    # Semantic items go through a buffered flusher; landmark metadata shares one batch writer for the run
+    semantic_queue = asyncio.Queue(maxsize=SEMANTIC_QUEUE_SIZE)
+    flusher = asyncio.create_task(flush_semantic_items(semantic_queue))
+    try:
+        await run_landmarks(semantic_queue)
+    finally:
+        # Always flush whatever is buffered, including on cancellation
+        await semantic_queue.put(None)
+        await flusher
 
 if __name__ == "__main__":
     asyncio.run(main())
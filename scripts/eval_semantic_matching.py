@@ -0,0 +1,42 @@
+# === eval_semantic_matching.py ===
+# Score semantic key matching against a labelled question set.
+# Input: JSONL lines of {"landmark": ..., "question": ..., "expected": <semantic key or null>}
+# Usage (from the repo root): python scripts/eval_semantic_matching.py questions.jsonl
+import orjson
+import os
+import sys
+from collections import defaultdict
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from services.semantic_matching_service import semantic_matching_service
+
+def load_cases(path: str) -> list:
+    with open(path, "rb") as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+def main(path: str):
+    cases = load_cases(path)
+
+    # One batched encode + FAISS search per landmark instead of one per question
+    by_landmark = defaultdict(list)
+    for case in cases:
+        by_landmark[case["landmark"]].append(case)
+
+    correct = 0
+    for landmark, landmark_cases in by_landmark.items():
+        results = semantic_matching_service.get_landmark_specific_semantic_keys(
+            [case["question"] for case in landmark_cases], landmark
+        )
+        for case, (semantic_key, score) in zip(landmark_cases, results):
+            if semantic_key == case.get("expected"):
+                correct += 1
+            else:
+                print(f"❌ {landmark}: '{case['question']}' -> {semantic_key} ({score}), expected {case.get('expected')}")
+
+    print(f"📊 {correct}/{len(cases)} questions matched the expected semantic key")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python scripts/eval_semantic_matching.py questions.jsonl")
+        sys.exit(1)
+    main(sys.argv[1])
@@ -1,7 +1,13 @@
 import boto3
 import os
+import sys
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.aws_clients import BATCH_BOTO_CONFIG
+
 # Load environment variables
 load_dotenv()
 
@@ -10,10 +16,29 @@ s3_client = boto3.client(
     "s3",
     aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
     aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("AWS_REGION", "us-east-2")
+    region_name=os.getenv("AWS_REGION", "us-east-2"),
+    config=BATCH_BOTO_CONFIG
 )
 S3_BUCKET = os.getenv("S3_BUCKET_NAME")
 
+# Shared transfer settings; large files go multipart with parallel parts
+MB = 1024 * 1024
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * MB,
+    multipart_chunksize=16 * MB,
+    max_concurrency=16,
+    use_threads=True
+)
+
+CONFIG_FILES = [
+    ("scripts/landmarks.json", "config/landmarks.json"),
+    ("scripts/semantic_config.json", "config/semantic_config.json"),
+    # Registration option files
+    ("scripts/countries.json", "config/countries.json"),
+    ("scripts/languages.json", "config/languages.json"),
+    ("scripts/interests.json", "config/interests.json"),
+]
+
 def upload_file_to_s3(local_file_path: str, s3_key: str, content_type: str = "application/json"):
     """Upload a file to S3"""
     try:
@@ -22,7 +47,8 @@ def upload_file_to_s3(local_file_path: str, s3_key: str, content_type: str = "ap
                 file,
                 S3_BUCKET,
                 s3_key,
-                ExtraArgs={'ContentType': content_type}
+                ExtraArgs={'ContentType': content_type},
+                Config=TRANSFER_CONFIG
             )
         print(f"✅ Uploaded {local_file_path} to s3://{S3_BUCKET}/{s3_key}")
     except Exception as e:
@@ -32,16 +58,10 @@ def main():
     """Upload configuration files to S3"""
     print("🚀 Uploading configuration files to S3...")
     
-    # Upload landmarks.json
-    upload_file_to_s3("scripts/landmarks.json", "config/landmarks.json")
-    
-    # Upload semantic_config.json
-    upload_file_to_s3("scripts/semantic_config.json", "config/semantic_config.json")
-    
-    # Upload new registration option files
-    upload_file_to_s3("scripts/countries.json", "config/countries.json")
-    upload_file_to_s3("scripts/languages.json", "config/languages.json")
-    upload_file_to_s3("scripts/interests.json", "config/interests.json")
+    # Upload all files concurrently over the shared client
+    with ThreadPoolExecutor(max_workers=len(CONFIG_FILES)) as pool:
+        for local_file_path, s3_key in CONFIG_FILES:
+            pool.submit(upload_file_to_s3, local_file_path, s3_key)
     
     print("✅ Configuration upload complete!")
 
@@ -1,6 +1,5 @@
 from sentence_transformers import SentenceTransformer, util
 import faiss
-import numpy as np
 
 # === Load embedding model (FREE + offline) ===
 model = SentenceTransformer('all-MiniLM-L6-v2')
@@ -26,22 +25,27 @@ semantic_data = [
 ]
 
 # === Build FAISS Index ===
-index = faiss.IndexFlatL2(dimension)
-vectors = []
-metadata = []
+# Embeddings are normalized, so inner product is cosine similarity.
+# HNSW graph search keeps queries sub-linear as semantic_data grows.
+index = faiss.IndexHNSWFlat(dimension, 32, faiss.METRIC_INNER_PRODUCT)
+index.hnsw.efConstruction = 200
+metadata = list(semantic_data)
 
 print("Generating embeddings and building FAISS index...")
-for item in semantic_data:
-    emb = model.encode(item["query"])
-    vectors.append(emb)
-    metadata.append(item)
+vectors = model.encode(
+    [item["query"] for item in metadata],
+    batch_size=64,
+    convert_to_numpy=True,
+    normalize_embeddings=True
+).astype('float32')
 
-index.add(np.array(vectors).astype('float32'))
+index.add(vectors)
+index.hnsw.efSearch = 64
 print("Index built with", len(metadata), "entries.")
 
 # === Query Interface ===
 def query_faiss(question):
-    q_emb = model.encode(question).reshape(1, -1).astype('float32')
+    q_emb = model.encode(question, convert_to_numpy=True, normalize_embeddings=True).reshape(1, -1).astype('float32')
     D, I = index.search(q_emb, k=1)
     match = metadata[I[0][0]]
     score = D[0][0]
@@ -51,11 +55,11 @@ def query_faiss(question):
 if __name__ == '__main__':
     user_question = input("Ask a follow-up question: ")
     result, score = query_faiss(user_question)
-    if score < 0.7:  # L2 distance threshold (tune this based on tests)
+    if score > 0.65:  # Cosine similarity threshold (same cut-off as the old squared-L2 < 0.7)
         print("\n✅ Match Found!")
         print("Semantic Key:", result["key"])
         print("Response:", result["text"])
-        print("Score (L2 Distance):", score)
+        print("Score (Cosine Similarity):", score)
     else:
         print("\n⚠️ No confident match found. Consider calling LLM.")
-        print("Score (L2 Distance):", score)
+        print("Score (Cosine Similarity):", score)
@@ -1,41 +1,87 @@
 import os
+import asyncio
+import shutil
+import subprocess
 import tempfile
 import speech_recognition as sr
-from pydub import AudioSegment
 import io
+from typing import BinaryIO, Union
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+# Decode any upload to 16 kHz mono PCM WAV on stdout; halves what gets sent to Google STT
+FFMPEG_WAV_ARGS = ["-f", "wav", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1", "pipe:1"]
+
+# Google STT by default. STT_BACKEND=whisper opts into local int8 Whisper (CTranslate2); WHISPER_MODEL
+# is a model name downloaded on first start, or a path to a pre-provisioned model directory.
+STT_BACKEND = os.getenv("STT_BACKEND", "google")
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small.en")
 
 class AudioProcessingService:
     def __init__(self):
         self.recognizer = sr.Recognizer()
+        # Fixed threshold instead of calibrating per request; uploads are short, pre-recorded questions
+        self.recognizer.energy_threshold = 300
+        self.recognizer.dynamic_energy_threshold = False
+        self.stt = self._load_whisper()
+    
+    def _load_whisper(self):
+        """Load the local Whisper model, or None to use Google STT"""
+        if STT_BACKEND != "whisper":
+            return None
+        if WhisperModel is None:
+            print("⚠️ faster-whisper not installed, falling back to Google speech recognition")
+            return None
+        print(f"🔧 Loading Whisper model {WHISPER_MODEL} (int8, CPU)...")
+        try:
+            return WhisperModel(WHISPER_MODEL, device="cpu", compute_type="int8")
+        except Exception as e:
+            print(f"⚠️ Could not load Whisper model {WHISPER_MODEL} ({e}), falling back to Google speech recognition")
+            return None
     
-    async def audio_to_text(self, audio_file: bytes, file_extension: str = "m4a") -> str:
+    async def audio_to_text(self, audio_file: Union[bytes, BinaryIO], file_extension: str = "m4a") -> str:
         """
         Convert audio file bytes to text using speech recognition.
         
         Args:
-            audio_file: Audio file as bytes
+            audio_file: Audio file as bytes or a readable file-like object (streamed in chunks)
             file_extension: File extension (m4a, wav, mp3, etc.)
             
         Returns:
             Extracted text from the audio
         """
+        # ffmpeg, disk I/O and recognize_google all block; keep them off the event loop
+        return await asyncio.to_thread(self._blocking_transcribe, audio_file, file_extension)
+
+    def _blocking_transcribe(self, audio_file: Union[bytes, BinaryIO], file_extension: str) -> str:
+        """Synchronous body of audio_to_text; runs in a worker thread"""
         try:
             # Create a temporary file to store the audio
             with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file_extension}") as temp_file:
-                temp_file.write(audio_file)
+                if isinstance(audio_file, (bytes, bytearray)):
+                    temp_file.write(audio_file)
+                else:
+                    # Stream the upload to disk so the whole file is never held in memory
+                    shutil.copyfileobj(audio_file, temp_file, 64 * 1024)
                 temp_file_path = temp_file.name
             
-            # Convert audio to WAV format if needed (speech_recognition works best with WAV)
-            if file_extension.lower() != "wav":
-                audio = AudioSegment.from_file(temp_file_path, format=file_extension)
-                wav_path = temp_file_path.replace(f".{file_extension}", ".wav")
-                audio.export(wav_path, format="wav")
-                temp_file_path = wav_path
+            # Transcode in one ffmpeg call and keep the WAV in memory.
+            # The input stays a seekable file: phone m4a often has its moov atom at the end.
+            wav_bytes = self._to_wav_bytes(temp_file_path)
+            
+            if self.stt is not None:
+                segments, _ = self.stt.transcribe(io.BytesIO(wav_bytes), beam_size=1, vad_filter=True)
+                text = " ".join(segment.text.strip() for segment in segments).strip()
+                if not text:
+                    raise sr.UnknownValueError()
+                print(f"🎤 Audio converted to text: '{text}'")
+                return text
             
             # Use speech recognition to convert audio to text
-            with sr.AudioFile(temp_file_path) as source:
-                # Adjust for ambient noise
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+            with sr.AudioFile(io.BytesIO(wav_bytes)) as source:
                 audio_data = self.recognizer.record(source)
                 
                 # Perform speech recognition
@@ -57,14 +103,21 @@ class AudioProcessingService:
             raise Exception(f"Failed to process audio: {str(e)}")
             
         finally:
-            # Clean up temporary files
+            # Clean up the temporary upload
             try:
                 if os.path.exists(temp_file_path):
                     os.unlink(temp_file_path)
-                if file_extension.lower() != "wav" and os.path.exists(temp_file_path.replace(".wav", f".{file_extension}")):
-                    os.unlink(temp_file_path.replace(".wav", f".{file_extension}"))
             except:
                 pass
 
+    def _to_wav_bytes(self, input_path: str) -> bytes:
+        """Run ffmpeg once, reading the upload from disk and writing WAV to a pipe"""
+        result = subprocess.run(
+            ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", input_path, *FFMPEG_WAV_ARGS],
+            capture_output=True,
+            check=True
+        )
+        return result.stdout
+
 # Global instance
 audio_processing_service = AudioProcessingService() 
\ No newline at end of file
@@ -0,0 +1,64 @@
+import os
+import asyncio
+import hashlib
+from collections import deque
+import numpy as np
+import orjson
+from cachetools import TTLCache
+
+# Cached answers expire after a day so edited prompts and facts eventually take effect
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+LLM_CACHE_SIZE = 4096
+# Paraphrase reuse (L2) is opt-in: near-identical questions can still differ in a key detail
+SEMANTIC_CACHE_ENABLED = os.getenv("LLM_SEMANTIC_CACHE", "false").lower() in ("1", "true", "yes")
+# Cosine similarity a new question needs against a cached one (same landmark and context) to reuse its answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", 0.98))
+SEMANTIC_CACHE_PER_CONTEXT = 256
+
+class LLMCache:
+    """
+    Two-layer in-process cache for LLM completions.
+    L1 is an exact hash of the request payload. L2 (opt-in, LLM_SEMANTIC_CACHE) matches paraphrased
+    questions by embedding, but only among answers for the same landmark and exact context.
+    """
+    def __init__(self, embed):
+        # embed(text) -> unit-normalized float32 vector
+        self.embed = embed
+        self.exact = TTLCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+        self.semantic = TTLCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+
+    @staticmethod
+    def cache_key(model: str, messages: list, temperature: float) -> str:
+        payload = {"model": model, "messages": messages, "temperature": temperature}
+        return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    async def get(self, key: str, landmark_id: str, context: tuple, question: str) -> tuple:
+        """Returns (response, status) where status is HIT-L1, HIT-L2 or MISS"""
+        response = self.exact.get(key)
+        if response is not None:
+            return response, "HIT-L1"
+        if not SEMANTIC_CACHE_ENABLED:
+            return None, "MISS"
+
+        entries = self.semantic.get((landmark_id, context))
+        if entries:
+            # The embedding is a model forward pass; keep it off the event loop
+            question_emb = await asyncio.to_thread(self.embed, question)
+            similarities = np.stack([emb for emb, _ in entries]) @ question_emb
+            best = int(similarities.argmax())
+            if similarities[best] >= SEMANTIC_CACHE_THRESHOLD:
+                return entries[best][1], "HIT-L2"
+
+        return None, "MISS"
+
+    async def put(self, key: str, landmark_id: str, context: tuple, question: str, response: str):
+        self.exact[key] = response
+        if not SEMANTIC_CACHE_ENABLED:
+            return
+        question_emb = await asyncio.to_thread(self.embed, question)
+        scope = (landmark_id, context)
+        entries = self.semantic.get(scope)
+        if entries is None:
+            entries = deque(maxlen=SEMANTIC_CACHE_PER_CONTEXT)
+            self.semantic[scope] = entries
+        entries.append((question_emb, response))
@@ -1,16 +1,128 @@
 import os
-import json
+import orjson
+import asyncio
+import logging
+import httpx
 import openai
-from typing import Optional
+from typing import AsyncIterator, Optional
+from services.llm_cache import LLMCache
+from services.semantic_matching_service import semantic_matching_service
+
+logger = logging.getLogger(__name__)
+
+# Cap on concurrent in-flight OpenAI completions from this process
+OPENAI_CONCURRENCY = 10
+OPENAI_MODEL = "gpt-3.5-turbo"
+# One shared system message dict; only the user message is built per request
+SYSTEM_MESSAGE = {"role": "system", "content": "You are a friendly and knowledgeable travel guide."}
+
+# Built once and pre-stripped; only the per-request values are filled in
+CONTEXT_PROMPT_TEMPLATE = (
+    "You are a knowledgeable local tour guide. A traveler from {user_country} who enjoys {interest} is asking about {landmark}.\n"
+    "\n"
+    "Question: {question}\n"
+    "\n"
+    "Please provide a helpful, engaging response that's:\n"
+    "- Accurate and informative\n"
+    "- Tailored to someone interested in {interest}\n"
+    "- Friendly and conversational\n"
+    "- Under 200 words\n"
+    "- Easy to read out loud"
+)
 
 class LLMService:
     def __init__(self):
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         if self.openai_api_key:
-            self.client = openai.OpenAI(api_key=self.openai_api_key)
+            # Async client so completions don't block the event loop while other requests are served
+            self.client = openai.AsyncOpenAI(
+                api_key=self.openai_api_key,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    timeout=60,
+                    limits=httpx.Limits(max_connections=OPENAI_CONCURRENCY, max_keepalive_connections=OPENAI_CONCURRENCY)
+                )
+            )
         else:
             self.client = None
             print("⚠️ Warning: OPENAI_API_KEY not found. LLM fallbacks will not work.")
+        self.semaphore = asyncio.Semaphore(OPENAI_CONCURRENCY)
+        self.cache = LLMCache(lambda text: semantic_matching_service.encode_query(text, normalize=True))
+    
+    async def _cached_completion(self, user_prompt: str, landmark_id: str, context: tuple, question: str) -> str:
+        """Chat completion through the exact + semantic answer cache (write-through on miss)"""
+        messages = [SYSTEM_MESSAGE, {"role": "user", "content": user_prompt}]
+        key = LLMCache.cache_key(OPENAI_MODEL, messages, 0.7)
+        cached, status = await self.cache.get(key, landmark_id, context, question)
+        logger.debug(f"🗄️ LLM cache {status}")
+        if cached is not None:
+            return cached
+        
+        async with self.semaphore:
+            response = await self.client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500
+            )
+        answer = response.choices[0].message.content.strip()
+        await self.cache.put(key, landmark_id, context, question, answer)
+        return answer
+    
+    async def _stream_cached_completion(self, user_prompt: str, landmark_id: str, context: tuple, question: str) -> AsyncIterator[str]:
+        """Streaming variant of _cached_completion: yields text as it arrives, caches the full answer"""
+        messages = [SYSTEM_MESSAGE, {"role": "user", "content": user_prompt}]
+        key = LLMCache.cache_key(OPENAI_MODEL, messages, 0.7)
+        cached, status = await self.cache.get(key, landmark_id, context, question)
+        logger.debug(f"🗄️ LLM cache {status}")
+        if cached is not None:
+            yield cached
+            return
+        
+        # Upstream is read by a separate task, so a slow client never holds an OpenAI slot
+        pieces = asyncio.Queue()
+        pump = asyncio.create_task(self._pump_stream(messages, pieces))
+        parts = []
+        try:
+            while True:
+                piece = await pieces.get()
+                if piece is None:
+                    break
+                if isinstance(piece, Exception):
+                    raise piece
+                parts.append(piece)
+                yield piece
+        finally:
+            # Client went away early: stop reading upstream (this closes the OpenAI stream)
+            if not pump.done():
+                pump.cancel()
+        await self.cache.put(key, landmark_id, context, question, "".join(parts).strip())
+    
+    async def _pump_stream(self, messages: list, pieces: asyncio.Queue):
+        """Read a streamed completion into pieces under an OpenAI slot, ending with None (or the error)"""
+        try:
+            async with self.semaphore:
+                stream = await self.client.chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=500,
+                    stream=True
+                )
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            pieces.put_nowait(chunk.choices[0].delta.content)
+            pieces.put_nowait(None)
+        except Exception as e:
+            pieces.put_nowait(e)
+    
+    def _context_prompt(self, question: str, landmark_id: str, user_country: str, interest: str) -> str:
+        return CONTEXT_PROMPT_TEMPLATE.format_map({
+            "user_country": user_country,
+            "interest": interest,
+            "landmark": landmark_id.replace('_', ' '),
+            "question": question
+        })
     
     async def generate_response(self, question: str, landmark_id: str, landmark_type: str, user_country: str, interest: str) -> str:
         """
@@ -32,34 +144,44 @@ class LLMService:
         """
         try:
             # Create context-aware prompt similar to batch script
-            context_prompt = f"""
-            You are a knowledgeable local tour guide. A traveler from {user_country} who enjoys {interest} is asking about {landmark_id.replace('_', ' ')}.
-            
-            Question: {question}
-            
-            Please provide a helpful, engaging response that's:
-            - Accurate and informative
-            - Tailored to someone interested in {interest}
-            - Friendly and conversational
-            - Under 200 words
-            - Easy to read out loud
-            """
+            context_prompt = self._context_prompt(question, landmark_id, user_country, interest)
             
             # Use same configuration as batch script
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a friendly and knowledgeable travel guide."},
-                    {"role": "user", "content": context_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
-            return response.choices[0].message.content.strip()
+            return await self._cached_completion(context_prompt, landmark_id, ("context", user_country, interest), question)
         except Exception as e:
             print(f"OpenAI API error: {e}")
             raise
 
+    async def generate_response_stream(self, question: str, landmark_id: str, user_country: str, interest: str) -> AsyncIterator[str]:
+        """
+        Stream the general LLM answer for a landmark question token by token,
+        so callers (HTTP clients, TTS) can start before generation finishes.
+        """
+        if not self.client:
+            yield f"I'm sorry, I couldn't generate a response for that question about {landmark_id}. Please try asking something else."
+            return
+        context_prompt = self._context_prompt(question, landmark_id, user_country, interest)
+        async for piece in self._stream_cached_completion(context_prompt, landmark_id, ("context", user_country, interest), question):
+            yield piece
+
+    async def generate_json(self, prompt: str, max_tokens: int = 300) -> dict:
+        """Generate a JSON object using OpenAI's JSON mode, so the reply always parses"""
+        if not self.client:
+            return {}
+        async with self.semaphore:
+            response = await self.client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": "You extract structured data and reply with a single JSON object."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0,
+                max_tokens=max_tokens
+            )
+        result = orjson.loads(response.choices[0].message.content)
+        return result if isinstance(result, dict) else {}
+
     async def generate_response_with_prompt_and_age(
         self, prompt: str, question: str, landmark_id: str, 
         user_country: str, interest: str, age_group: str
@@ -79,16 +201,8 @@ class LLMService:
                 # Add the user's question to the formatted prompt
                 full_prompt = f"{formatted_prompt}\n\nUser Question: {question}\n\nResponse:"
                 
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are a friendly and knowledgeable travel guide."},
-                        {"role": "user", "content": full_prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=500
-                )
-                return response.choices[0].message.content.strip()
+                # The formatted prompt already pins landmark, country, interest and age group
+                return await self._cached_completion(full_prompt, landmark_id, ("prompt", formatted_prompt), question)
             else:
                 return f"I'm sorry, I couldn't generate a response for that question about {landmark_id}. Please try asking something else."
             
@@ -1,225 +1,437 @@
-import json
 import os
-from sentence_transformers import SentenceTransformer, util
+import hashlib
+import logging
+import threading
+import orjson
+from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
+import torch
+from functools import lru_cache
+from utils.local_config import LANDMARKS, SEMANTIC_CONFIG
+
+logger = logging.getLogger(__name__)
+
+QUERY_EMBEDDING_CACHE_SIZE = 4096
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+# "torch" keeps the PyTorch model; "onnx" (opt-in) runs a hub ONNX export on ONNX Runtime.
+# The default export is the portable FP32 one, so embeddings match the tuned SEMANTIC_KEY_THRESHOLD;
+# CPU-specific int8 exports (e.g. onnx/model_qint8_avx512_vnni.onnx) should be re-checked against it first.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+# Containers often misreport cores to torch/ORT; pin intra-op threads explicitly for both backends
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", os.cpu_count() or 4))
+# Each query searches a tiny index; concurrent requests parallelize better than OpenMP inside one search
+FAISS_OMP_THREADS = int(os.getenv("FAISS_OMP_THREADS", 1))
+CANDIDATE_MATRIX_CACHE_SIZE = 256
+# Built example indexes are persisted here, keyed by model, backend, index spec and examples
+SEMANTIC_INDEX_CACHE_DIR = os.getenv("SEMANTIC_INDEX_CACHE_DIR", ".cache/semantic_index")
+# FAISS index_factory spec: exact "Flat" search until the example set is large enough for
+# an HNSW graph walk to beat a full scan. SEMANTIC_INDEX_SPEC forces a spec either way.
+SEMANTIC_INDEX_SPEC = os.getenv("SEMANTIC_INDEX_SPEC")
+HNSW_INDEX_SPEC = "HNSW32"
+HNSW_MIN_VECTORS = 1000
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 32
+# Minimum cosine similarity for a semantic key match. Equivalent to the old 1/(1+L2²) > 0.4
+# cut-off on unit vectors, where L2² = 2 - 2cos.
+SEMANTIC_KEY_THRESHOLD = 0.25
+SEMANTIC_KEY_TOP_K = 3
+
+# Canonical phrasings per semantic key; embedded once into the FAISS index at startup
+SEMANTIC_EXAMPLES = {
+    "origin.general": [
+        "how did it come to be",
+        "when was it built", 
+        "how was it created",
+        "what's the history",
+        "origin story",
+        "when was this built",
+        "how did this get here",
+        "what's the story behind this"
+    ],
+    "origin.name": [
+        "name meaning",
+        "why called",
+        "naming",
+        "name origin", 
+        "what does the name mean",
+        "why is it called",
+        "how did it get its name",
+        "what's the meaning of the name"
+    ],
+    "architecture.style": [
+        "what style is it",
+        "architecture",
+        "design",
+        "how does it look",
+        "architectural features",
+        "architectural style",
+        "what kind of building is this",
+        "how was this designed"
+    ],
+    "height.general": [
+        "how tall",
+        "height",
+        "how high",
+        "tallness",
+        "elevation",
+        "what's the height",
+        "how tall is this",
+        "what's the elevation"
+    ],
+    "experience.vibe": [
+        "what's the vibe",
+        "atmosphere",
+        "feel",
+        "mood",
+        "what's it like",
+        "how does it feel",
+        "what's the atmosphere like",
+        "what's the mood here"
+    ],
+    "access.cost": [
+        "how much",
+        "cost",
+        "price",
+        "ticket",
+        "entry fee",
+        "how much does it cost",
+        "what's the price",
+        "how much to enter"
+    ],
+    "access.hours": [
+        "hours",
+        "opening times",
+        "when open",
+        "schedule",
+        "what time does it open",
+        "when is it open",
+        "what are the hours",
+        "opening hours"
+    ],
+    "culture.symbolism": [
+        "symbols",
+        "meaning",
+        "symbolism",
+        "cultural significance",
+        "what does it represent",
+        "what's the meaning",
+        "cultural meaning",
+        "what does this symbolize"
+    ],
+    "myths.legends": [
+        "myths",
+        "legends",
+        "stories",
+        "folklore",
+        "tales",
+        "urban legends",
+        "mythical stories",
+        "legendary tales"
+    ],
+    "access.crowds": [
+        "crowds",
+        "busy",
+        "crowded",
+        "people",
+        "visitors",
+        "how many people",
+        "how crowded",
+        "how busy",
+        "how many visitors",
+        "how many people visit",
+        "how many people come",
+        "how many people tend to come",
+        "how many people like to visit"
+    ]
+}
 
 class SemanticMatchingService:
     def __init__(self):
-        self.landmarks_data = self._load_landmarks()
-        self.semantic_config = self._load_semantic_config()
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.landmarks_data = LANDMARKS
+        self.semantic_config = SEMANTIC_CONFIG
+        # Per-request lookups by lowercased landmark name and by type (keys as sets for O(1) membership)
+        self._name_to_type = {l["name"].lower(): l["type"] for l in self.landmarks_data}
+        self._available_keys = {
+            t: frozenset(self.semantic_config.get(t, {}))
+            for t in set(self._name_to_type.values())
+        }
+        self.model = self._load_model()
         self.dimension = 384
         self.index = None
-        self.metadata = []
+        # Index row -> semantic key / example phrasing, as parallel lists
+        self.row_keys = []
+        self.row_examples = []
+        # Repeated questions (and the same question hitting several lookups) skip the model
+        self._encode_cached = lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(self._encode_bytes)
+        # A landmark's stored Q&A questions are scored on every ask; keep their normalized matrix
+        self._candidate_matrix = lru_cache(maxsize=CANDIDATE_MATRIX_CACHE_SIZE)(self._encode_matrix)
+        # Per-thread FAISS result buffers, reused by every single-question search on that thread
+        self._search_buffers = threading.local()
+        faiss.omp_set_num_threads(FAISS_OMP_THREADS)
         self._build_faiss_index()
     
-    def _load_landmarks(self):
-        """Load landmarks metadata."""
-        with open("scripts/landmarks.json", "r") as f:
-            return json.load(f)
+    def _load_model(self):
+        """Load the embedding model, on ONNX Runtime when EMBEDDING_BACKEND=onnx."""
+        torch.set_num_threads(TORCH_NUM_THREADS)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # Already fixed once any parallel work has run in this process
+        if EMBEDDING_BACKEND == "onnx":
+            try:
+                import onnxruntime
+                # Match ORT's intra-op pool to the same core budget as the torch path
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = TORCH_NUM_THREADS
+                session_options.inter_op_num_threads = 1
+                model = SentenceTransformer(
+                    EMBEDDING_MODEL,
+                    backend="onnx",
+                    model_kwargs={
+                        "file_name": EMBEDDING_ONNX_FILE,
+                        "provider": "CPUExecutionProvider",
+                        "session_options": session_options
+                    }
+                )
+                print(f"✅ Loaded {EMBEDDING_MODEL} on ONNX Runtime ({EMBEDDING_ONNX_FILE})")
+                self.embedding_backend = f"onnx:{EMBEDDING_ONNX_FILE}"
+                return model
+            except Exception as e:
+                print(f"⚠️ ONNX embedding backend unavailable ({e}), falling back to PyTorch")
+        self.embedding_backend = "torch"
+        return SentenceTransformer(EMBEDDING_MODEL).eval()
     
-    def _load_semantic_config(self):
-        """Load semantic configuration."""
-        with open("scripts/semantic_config.json", "r") as f:
-            return json.load(f)
+    def _index_cache_path(self):
+        """On-disk location of the example index for the current model, backend and examples."""
+        fingerprint = orjson.dumps(
+            {"model": EMBEDDING_MODEL, "backend": self.embedding_backend, "index": self.index_spec, "examples": SEMANTIC_EXAMPLES},
+            option=orjson.OPT_SORT_KEYS
+        )
+        digest = hashlib.blake2b(fingerprint, digest_size=16).hexdigest()
+        return os.path.join(SEMANTIC_INDEX_CACHE_DIR, f"semantic_index_{digest}.faiss")
     
-    def _build_faiss_index(self):
-        """Build FAISS index with semantic key examples."""
-        print("🔧 Building FAISS semantic index...")
+    @staticmethod
+    def _default_index_spec(n_vectors):
+        """Flat below HNSW_MIN_VECTORS examples, HNSW above, unless SEMANTIC_INDEX_SPEC is set."""
+        if SEMANTIC_INDEX_SPEC:
+            return SEMANTIC_INDEX_SPEC
+        return HNSW_INDEX_SPEC if n_vectors >= HNSW_MIN_VECTORS else "Flat"
+    
+    def _build_faiss_index(self, index_spec=None):
+        """Build FAISS index with semantic key examples, reusing a persisted copy when available."""
+        # Row metadata is derived from the constant examples, in index row order
+        self.row_keys = []
+        self.row_examples = []
+        for semantic_key, examples in SEMANTIC_EXAMPLES.items():
+            self.row_keys.extend([semantic_key] * len(examples))
+            self.row_examples.extend(examples)
         
-        # Define semantic key examples with multiple variations
-        semantic_examples = {
-            "origin.general": [
-                "how did it come to be",
-                "when was it built", 
-                "how was it created",
-                "what's the history",
-                "origin story",
-                "when was this built",
-                "how did this get here",
-                "what's the story behind this"
-            ],
-            "origin.name": [
-                "name meaning",
-                "why called",
-                "naming",
-                "name origin", 
-                "what does the name mean",
-                "why is it called",
-                "how did it get its name",
-                "what's the meaning of the name"
-            ],
-            "architecture.style": [
-                "what style is it",
-                "architecture",
-                "design",
-                "how does it look",
-                "architectural features",
-                "architectural style",
-                "what kind of building is this",
-                "how was this designed"
-            ],
-            "height.general": [
-                "how tall",
-                "height",
-                "how high",
-                "tallness",
-                "elevation",
-                "what's the height",
-                "how tall is this",
-                "what's the elevation"
-            ],
-            "experience.vibe": [
-                "what's the vibe",
-                "atmosphere",
-                "feel",
-                "mood",
-                "what's it like",
-                "how does it feel",
-                "what's the atmosphere like",
-                "what's the mood here"
-            ],
-            "access.cost": [
-                "how much",
-                "cost",
-                "price",
-                "ticket",
-                "entry fee",
-                "how much does it cost",
-                "what's the price",
-                "how much to enter"
-            ],
-            "access.hours": [
-                "hours",
-                "opening times",
-                "when open",
-                "schedule",
-                "what time does it open",
-                "when is it open",
-                "what are the hours",
-                "opening hours"
-            ],
-            "culture.symbolism": [
-                "symbols",
-                "meaning",
-                "symbolism",
-                "cultural significance",
-                "what does it represent",
-                "what's the meaning",
-                "cultural meaning",
-                "what does this symbolize"
-            ],
-            "myths.legends": [
-                "myths",
-                "legends",
-                "stories",
-                "folklore",
-                "tales",
-                "urban legends",
-                "mythical stories",
-                "legendary tales"
-            ],
-            "access.crowds": [
-                "crowds",
-                "busy",
-                "crowded",
-                "people",
-                "visitors",
-                "how many people",
-                "how crowded",
-                "how busy",
-                "how many visitors",
-                "how many people visit",
-                "how many people come",
-                "how many people tend to come",
-                "how many people like to visit"
-            ]
-        }
+        self.index_spec = index_spec or self._default_index_spec(len(self.row_keys))
+        cache_path = self._index_cache_path()
+        self.index = None
+        if os.path.exists(cache_path):
+            try:
+                self.index = faiss.read_index(cache_path)
+                print(f"✅ Loaded FAISS semantic index from {cache_path}")
+            except Exception as e:
+                print(f"⚠️ Persisted FAISS semantic index unreadable ({e}), rebuilding")
+        if self.index is None:
+            self._encode_faiss_index(cache_path)
+        if isinstance(self.index, faiss.IndexHNSW):
+            self.index.hnsw.efSearch = HNSW_EF_SEARCH
         
-        # Build vectors and metadata
-        vectors = []
-        self.metadata = []
+        # Verbatim example phrasings resolve without an embedding (see _normalize_question)
+        self.example_keys = dict(zip(self.row_examples, self.row_keys))
         
-        for semantic_key, examples in semantic_examples.items():
-            for example in examples:
-                emb = self.model.encode(example)
-                vectors.append(emb)
-                self.metadata.append({
-                    "semantic_key": semantic_key,
-                    "example": example
-                })
+        print(f"✅ FAISS {self.index_spec} index ready with {len(self.row_keys)} semantic examples")
+    
+    def _encode_faiss_index(self, cache_path):
+        """Embed every example in one batched encode, build the index for self.index_spec and persist it."""
+        print("🔧 Building FAISS semantic index...")
+        vectors = self.model.encode(
+            self.row_examples,
+            batch_size=128,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
         
-        # Create FAISS index
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.index.add(np.array(vectors).astype('float32'))
+        # Create FAISS index from the spec (exact flat scan or HNSW graph).
+        # Vectors are unit-length, so inner product scores are cosine similarities.
+        self.index = faiss.index_factory(self.dimension, self.index_spec, faiss.METRIC_INNER_PRODUCT)
+        if isinstance(self.index, faiss.IndexHNSW):
+            self.index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        self.index.add(np.asarray(vectors, dtype='float32'))
         
-        print(f"✅ FAISS index built with {len(self.metadata)} semantic examples")
+        try:
+            os.makedirs(SEMANTIC_INDEX_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            faiss.write_index(self.index, tmp_path)
+            os.replace(tmp_path, cache_path)  # Atomic, so concurrent workers never read a partial file
+        except Exception as e:
+            print(f"⚠️ Could not persist FAISS semantic index: {e}")
     
+    def _encode_bytes(self, text, normalize=False):
+        """Encode a single string; returns float32 bytes so cached entries stay immutable."""
+        emb = self.model.encode(text, convert_to_numpy=True, normalize_embeddings=normalize)
+        return emb.astype(np.float32, copy=False).tobytes()
+
+    def encode_query(self, text, normalize=False):
+        """Embedding for a query string, memoized by exact text."""
+        return np.frombuffer(self._encode_cached(text, normalize), dtype=np.float32).copy()
+
+    def _query_search_buffers(self):
+        """(D, I) output arrays for a one-row top-k search, allocated once per thread."""
+        buffers = getattr(self._search_buffers, "arrays", None)
+        if buffers is None:
+            buffers = (
+                np.empty((1, SEMANTIC_KEY_TOP_K), dtype=np.float32),
+                np.empty((1, SEMANTIC_KEY_TOP_K), dtype=np.int64)
+            )
+            self._search_buffers.arrays = buffers
+        return buffers
+
+    def _encode_matrix(self, texts):
+        """Encode a tuple of strings into a read-only (N, dim) matrix of unit vectors."""
+        matrix = self.model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True).astype(np.float32, copy=False)
+        matrix.setflags(write=False)
+        return matrix
+
     def calculate_similarity(self, text1, text2):
-        emb1 = self.model.encode(text1)
-        emb2 = self.model.encode(text2)
-        return float(util.cos_sim(emb1, emb2)[0][0])
+        emb1, emb2 = self.model.encode([text1, text2], convert_to_numpy=True, normalize_embeddings=True)
+        return float(np.dot(emb1, emb2))
+
+    def calculate_similarities(self, text, candidates):
+        """
+        Score one text against many candidates in a single batched encode + matrix product.
+        Returns a float32 array of cosine similarities aligned with candidates.
+        """
+        if not candidates:
+            return np.zeros(0, dtype=np.float32)
+        query_emb = self.encode_query(text, normalize=True)
+        return self._candidate_matrix(tuple(candidates)) @ query_emb
+
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation for exact example lookup"""
+        return " ".join(question.lower().split()).rstrip("?!. ")
 
-    def get_landmark_specific_semantic_key(self, question: str, landmark_id: str, threshold: float = 0.4):
+    def get_landmark_specific_semantic_key(self, question: str, landmark_id: str, threshold: float = SEMANTIC_KEY_THRESHOLD):
         """
         Get the best semantic key for a question using FAISS-based semantic matching.
         """
         try:
             # 1. Find landmark and get its type
-            landmark_type = None
             normalized_landmark_id = landmark_id.lower().replace("_", " ")
-            
-            for landmark in self.landmarks_data:
-                landmark_name_lower = landmark["name"].lower()
-                if landmark_name_lower == normalized_landmark_id:
-                    landmark_type = landmark["type"]
-                    break
+            landmark_type = self._name_to_type.get(normalized_landmark_id)
             
             if not landmark_type:
-                print(f"⚠️ Landmark '{landmark_id}' not found in landmarks.json")
-                print(f"🔍 Looking for: '{normalized_landmark_id}'")
-                print(f"📋 Available landmarks: {[l['name'] for l in self.landmarks_data]}")
+                logger.warning(f"⚠️ Landmark '{landmark_id}' not found in landmarks.json (looked for '{normalized_landmark_id}')")
                 return None, None
             
             # 2. Get available semantic keys for this landmark type
-            available_keys = list(self.semantic_config.get(landmark_type, {}).keys())
-            print(f"🔍 Landmark: {landmark_id} -> Type: {landmark_type}")
-            print(f"📋 Available keys: {available_keys}")
+            available_keys = self._available_keys.get(landmark_type, frozenset())
+            # Debug dumps are only formatted when DEBUG is on; nothing is written on the normal path
+            debug = logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                logger.debug(f"🔍 Landmark: {landmark_id} -> Type: {landmark_type}")
+                logger.debug(f"📋 Available keys: {sorted(available_keys)}")
             
-            # 3. Use FAISS semantic matching
-            question_emb = self.model.encode(question).reshape(1, -1).astype('float32')
-            D, I = self.index.search(question_emb, k=3)  # Get top 3 matches
+            # 3. Exact hit on an example phrasing: identical text would score 1.0 in FAISS anyway
+            exact_key = self.example_keys.get(self._normalize_question(question))
+            if exact_key and exact_key in available_keys:
+                if debug:
+                    logger.debug(f"✅ Exact example match: {exact_key}")
+                return exact_key, 1.0
+            
+            # 4. Use FAISS semantic matching over all examples. The global top-k acts as a guard:
+            # when the nearest examples all belong to keys this type lacks, there is no match, rather
+            # than forcing the nearest allowed key (the threshold is tuned for this ranking)
+            if not available_keys:
+                logger.warning(f"❌ No semantic keys configured for type: {landmark_type}")
+                return None, None
+            # Read-only view over the cached embedding bytes; FAISS only reads it, so skip the copy
+            question_emb = np.frombuffer(self._encode_cached(question, True), dtype=np.float32).reshape(1, -1)
+            D, I = self._query_search_buffers()
+            self.index.search(question_emb, SEMANTIC_KEY_TOP_K, D=D, I=I)
             
             best_match = None
             best_score = 0.0  # Start with 0, higher similarity is better
             
-            for i, (distance, idx) in enumerate(zip(D[0], I[0])):
-                match = self.metadata[idx]
-                semantic_key = match["semantic_key"]
-                example = match["example"]
+            for i, (similarity, idx) in enumerate(zip(D[0], I[0])):
+                if idx < 0:
+                    continue  # Fewer than k examples indexed
+                semantic_key = self.row_keys[idx]
+                similarity_score = float(similarity)  # Already cosine similarity
+                
+                if debug:
+                    logger.debug(f"🔍 Match {i+1}: {semantic_key} (example: '{self.row_examples[idx]}') - Similarity: {similarity_score:.3f}")
                 
-                # Only consider keys available for this landmark type
-                if semantic_key in available_keys:
-                    # Convert L2 distance to similarity score (0-1, higher is better)
-                    similarity_score = 1.0 / (1.0 + distance)
-                    
-                    print(f"🔍 Match {i+1}: {semantic_key} (example: '{example}') - Distance: {distance:.3f}, Similarity: {similarity_score:.3f}")
-                    
-                    if similarity_score > best_score:
-                        best_score = similarity_score
-                        best_match = semantic_key
+                if semantic_key not in available_keys:
+                    continue  # Key not configured for this landmark type
+                
+                if similarity_score > best_score:
+                    best_score = similarity_score
+                    best_match = semantic_key
             
             if best_match and best_score > threshold:
-                print(f"✅ Semantic match: {best_match} (similarity: {best_score:.3f})")
+                if debug:
+                    logger.debug(f"✅ Semantic match: {best_match} (similarity: {best_score:.3f})")
                 return best_match, best_score
             else:
-                print(f"❌ No confident semantic match found (best: {best_match}, score: {best_score:.3f})")
+                if debug:
+                    logger.debug(f"❌ No confident semantic match found (best: {best_match}, score: {best_score:.3f})")
                 return None, None
                 
-        except Exception as e:
-            print(f"🔥 ERROR in semantic matching: {e}")
+        except Exception:
+            logger.exception("🔥 ERROR in semantic matching")
             return None, None
 
+    def get_landmark_specific_semantic_keys(self, questions: list, landmark_id: str, threshold: float = SEMANTIC_KEY_THRESHOLD) -> list:
+        """
+        Batch form of get_landmark_specific_semantic_key for prewarming and evaluation.
+        Encodes all non-exact questions in one forward pass and runs one FAISS search.
+        Returns a (semantic_key, score) pair per question, (None, None) when not confident.
+        """
+        results = [(None, None)] * len(questions)
+        landmark_type = self._name_to_type.get(landmark_id.lower().replace("_", " "))
+        if not landmark_type or not questions:
+            return results
+
+        available_keys = self._available_keys.get(landmark_type, frozenset())
+        pending = []
+        for i, question in enumerate(questions):
+            exact_key = self.example_keys.get(self._normalize_question(question))
+            if exact_key and exact_key in available_keys:
+                results[i] = (exact_key, 1.0)
+            else:
+                pending.append(i)
+
+        if not pending or not available_keys:
+            return results
+
+        embeddings = self.model.encode(
+            [questions[i] for i in pending],
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(np.float32, copy=False)
+        D, I = self.index.search(embeddings, k=SEMANTIC_KEY_TOP_K)
+
+        # FAISS returns neighbours most-similar-first, so the first available row is the best match;
+        # if none of the global top-k is available for the type, the question stays unmatched
+        for i, similarities, ids in zip(pending, D, I):
+            for similarity_score, idx in zip(similarities, ids):
+                if idx < 0 or self.row_keys[idx] not in available_keys:
+                    continue
+                if similarity_score > threshold:
+                    results[i] = (self.row_keys[idx], float(similarity_score))
+                break
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"✅ Batch semantic matching: {sum(key is not None for key, _ in results)}/{len(questions)} matched")
+        return results
+
 # Global instance
 semantic_matching_service = SemanticMatchingService() 
\ No newline at end of file
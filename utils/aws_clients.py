@@ -0,0 +1,42 @@
+import boto3
+import os
+from botocore.config import Config
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Shared botocore config: larger connection pool, keep-alive and adaptive retries
+BOTO_CONFIG = Config(
+    max_pool_connections=64,
+    retries={"mode": "adaptive", "max_attempts": 3},
+    tcp_keepalive=True,
+    connect_timeout=1,
+    read_timeout=5
+)
+
+# Batch scripts tolerate slower calls in exchange for more retries
+BATCH_BOTO_CONFIG = BOTO_CONFIG.merge(Config(
+    retries={"mode": "adaptive", "max_attempts": 10},
+    connect_timeout=3,
+    read_timeout=15
+))
+
+# Setup DynamoDB
+dynamodb = boto3.resource(
+    'dynamodb',
+    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+    region_name="us-east-2",
+    config=BOTO_CONFIG
+)
+
+# Setup S3 client
+s3_client = boto3.client(
+    "s3",
+    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+    region_name=os.getenv("AWS_REGION", "us-east-2"),
+    config=BOTO_CONFIG
+)
+S3_BUCKET = os.getenv("S3_BUCKET_NAME")
@@ -0,0 +1,13 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared HTTP session so CloudFront fetches reuse pooled keep-alive connections
+http_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=64,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.1)
+)
+http_session.mount("https://", _adapter)
+http_session.mount("http://", _adapter)
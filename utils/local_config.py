@@ -0,0 +1,13 @@
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+
+LANDMARKS_PATH = "scripts/landmarks.json"
+SEMANTIC_CONFIG_PATH = "scripts/semantic_config.json"
+
+def _read_json(path: str):
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+# Read both bundled configs in parallel once per process; services share the parsed objects
+with ThreadPoolExecutor(max_workers=2) as _pool:
+    LANDMARKS, SEMANTIC_CONFIG = _pool.map(_read_json, [LANDMARKS_PATH, SEMANTIC_CONFIG_PATH])
@@ -1,34 +1,42 @@
-import boto3
-import os
-import json
-from dotenv import load_dotenv
+import orjson
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.aws_clients import s3_client, S3_BUCKET
 
-# Load environment variables
-load_dotenv()
+# Fire a duplicate GET if the first has not returned by then, and take whichever wins
+HEDGE_AFTER_SECONDS = 0.5
+_hedge_pool = ThreadPoolExecutor(max_workers=8)
 
-# Setup S3 client
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("AWS_REGION", "us-east-2")
-)
-S3_BUCKET = os.getenv("S3_BUCKET_NAME")
+def _get_json_object(s3_key: str) -> dict:
+    response = s3_client.get_object(Bucket=S3_BUCKET, Key=s3_key)
+    return orjson.loads(response['Body'].read())
 
 def read_json_from_s3(s3_key: str) -> dict:
-    """Read JSON file from S3"""
+    """Read JSON file from S3, hedging slow requests with a second GET"""
     try:
-        response = s3_client.get_object(Bucket=S3_BUCKET, Key=s3_key)
-        content = response['Body'].read().decode('utf-8')
-        return json.loads(content)
+        first = _hedge_pool.submit(_get_json_object, s3_key)
+        done, _ = wait([first], timeout=HEDGE_AFTER_SECONDS)
+        if done:
+            return first.result()
+
+        print(f"⏱️ Slow read of {s3_key}, sending hedged request")
+        second = _hedge_pool.submit(_get_json_object, s3_key)
+        done, pending = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = done.pop()
+        if winner.exception() and pending:
+            # The first finisher failed; fall back to the request still in flight
+            return pending.pop().result()
+        return winner.result()
     except Exception as e:
         print(f"❌ Failed to read {s3_key} from S3: {e}")
         raise
 
+@lru_cache(maxsize=1)
 def get_landmarks_from_s3() -> list:
-    """Get landmarks.json from S3"""
+    """Get landmarks.json from S3 (fetched once per process)"""
     return read_json_from_s3("config/landmarks.json")
 
+@lru_cache(maxsize=1)
 def get_semantic_config_from_s3() -> dict:
-    """Get semantic_config.json from S3"""
-    return read_json_from_s3("config/semantic_config.json") 
\ No newline at end of file
+    """Get semantic_config.json from S3 (fetched once per process)"""
+    return read_json_from_s3("config/semantic_config.json")